@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from state import StateBackend
+
+def question_key(content_hash: str, question: str) -> str:
+    """Key for identical questions about the same document, ignoring case and spacing."""
+    normalized = " ".join(question.lower().split())
+    return f"question:{content_hash}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+class AnswerStore:
+    """Completed answers by question_id, bounded by count, approximate bytes and TTL.
+
+    single_flight() coalesces concurrent identical computations so retries and double-clicks
+    await the request already in flight instead of starting another one. With a shared state
+    backend, answers are also written through to it so a poll landing on another worker
+    process finds them; coalescing stays per process.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024, ttl_seconds: float = 600,
+                 shared: Optional[StateBackend] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # question_id -> (answer, stored_at, size)
+        self.total_bytes = 0
+        self.inflight: Dict[str, asyncio.Future] = {}  # key -> computation task
+        self.coalesced = 0
+        self.shared = shared
+
+    def get(self, question_id: str) -> Optional[Dict[str, str]]:
+        self.evict_expired()
+        entry = self.entries.get(question_id)
+        if entry is None and self.shared is not None:
+            return self.shared.get("answers", question_id)
+        return entry[0] if entry else None
+
+    def pop(self, question_id: str) -> Optional[Dict[str, str]]:
+        answer = self.drop_local(question_id)
+        if self.shared is not None:
+            shared_answer = self.shared.get("answers", question_id)
+            if shared_answer is not None:
+                self.shared.delete("answers", question_id)
+            answer = answer or shared_answer
+        return answer
+
+    def drop_local(self, question_id: str) -> Optional[Dict[str, str]]:
+        entry = self.entries.pop(question_id, None)
+        if entry is None:
+            return None
+        self.total_bytes -= entry[2]
+        return entry[0]
+
+    def set(self, question_id: str, answer: Dict[str, str]):
+        self.drop_local(question_id)
+        if self.shared is not None:
+            self.shared.set("answers", question_id, answer, self.ttl_seconds)
+        size = len(question_id) + sum(len(value) for value in answer.values())
+        self.entries[question_id] = (answer, time.monotonic(), size)
+        self.total_bytes += size
+        while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Entries are in insertion order, so expired ones are at the front
+        while self.entries:
+            question_id, (_, stored_at, _) = next(iter(self.entries.items()))
+            if stored_at > cutoff:
+                break
+            self.drop_local(question_id)
+
+    async def single_flight(self, keys: List[str], compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Await an in-flight computation registered under any of keys, or start compute under all of them.
+
+        compute runs as its own task, so a caller disconnecting (the first one included)
+        neither cancels it nor hands the others a CancelledError.
+        """
+        for key in keys:
+            task = self.inflight.get(key)
+            if task is not None:
+                self.coalesced += 1
+                return await asyncio.shield(task)
+        task = asyncio.ensure_future(compute())
+        for key in keys:
+            self.inflight[key] = task
+
+        def finished(task: asyncio.Future):
+            for key in keys:
+                if self.inflight.get(key) is task:
+                    del self.inflight[key]
+            # Mark the exception retrieved so it isn't logged when every waiter has gone
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(finished)
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "in_flight": len({id(task) for task in self.inflight.values()}),
+            "coalesced": self.coalesced,
+        }
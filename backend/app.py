@@ -1,20 +1,52 @@
+# Imported first so the import timings below cover everything else
+from startup import startup_timings, LazyResource
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from openai import OpenAI
-from datetime import datetime
-from config import OPENAI_API_KEY
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+startup_timings.mark("import.framework")
+from config import (
+    PROGRESS_TTL_SECONDS, PROGRESS_START_TIMEOUT_SECONDS, QUESTION_MODE, RETRIEVAL_TOP_K, RETRIEVAL_TOKEN_BUDGET,
+    CASCADE_TIERS, CASCADE_LEXICAL_TOP_K, SCAN_MODEL, SCREEN_MODEL, ANSWER_MODEL,
+    DOCUMENT_STORE_MAX_DOCUMENTS, DOCUMENT_STORE_MAX_TOKENS,
+    CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_SNAP_TO_SENTENCES, STREAM_UPLOAD_MAX_PENDING_CHUNKS,
+    CONTENT_DEFINED_BOUNDARIES, ANALYSIS_MEMO_MAX_DOCUMENTS, ANALYSIS_MEMO_MAX_BYTES, ANALYSIS_MEMO_TTL_SECONDS,
+    JOB_WORKERS, JOB_QUEUE_DEPTH, JOB_TTL_SECONDS, JOB_RETRY_AFTER_SECONDS,
+    ANSWER_STORE_MAX_ENTRIES, ANSWER_STORE_MAX_BYTES, ANSWER_TTL_SECONDS,
+    FINANCIAL_METRICS_TTL_SECONDS, MARKET_FETCH_WORKERS, TIMESERIES_CAPACITY,
+    WATCHLIST_FILE, WATCHLIST, WATCHLIST_BATCH_SIZE, WATCHLIST_BATCH_INTERVAL_SECONDS,
+    WATCHLIST_HOT_TTL_SECONDS, WATCHLIST_VIEWED_WINDOW_SECONDS,
+    HTTP_CACHE_MAX_AGE_SECONDS, HTTP_CACHE_STALE_SECONDS,
+    REPORT_BATCH_MAX_DOCUMENTS, REPORT_BATCH_CONCURRENCY, REPORT_INSERT_BATCH_SIZE,
+    TRACE_HEADER, TRACE_BUFFER_SIZE, EVENT_LOOP_LAG_INTERVAL_SECONDS,
+    OPENAI_API_KEY, SUPABASE_URL, SUPABASE_SERVICE_KEY, WARMUP_ON_STARTUP, WARMUP_RETRY_SECONDS,
+)
+from llm import chat_completion, stream_chat_completion, embed_texts, response_cache, gateway, async_client
+from retrieval import cosine_scores, select_top_chunks, LexicalIndex
+from documents import DocumentStore, StoredDocument
+from models import Document, DocumentBatch, Summary, Question, Answer
+from tokenization import encode, chunk_bounds, decode_chunks, warm_up as warm_up_tokenizer
+from progress import ProgressRegistry
+from state import state_backend
+from pipeline import AnalysisPipeline, ChunkFeed
+from ingest import StreamingDocument, upload_blocks
+from incremental import AnalysisMemo, AnalysisMemoStore
+from jobs import JobQueue, QueueFullError, JobExistsError
+from answers import AnswerStore, question_key
+from market import FinancialMetricsCache
+from watchlist import load_watchlist
+from http_cache import make_etag, is_not_modified, cached_json_response
+from metrics import registry, Gauge, Trace, TraceBuffer, current_trace, span, http_request_seconds, monitor_event_loop_lag
+from timeseries import TimeSeriesStore, rolling_stats
 import uvicorn
-import yfinance as yf
-import tiktoken
-import numpy as np
 import asyncio
 import json
-from supabase import create_client, Client
-import os
+import numpy as np
+import time
 import uuid
+startup_timings.mark("import.modules")
 
 app = FastAPI()
 
@@ -31,564 +63,499 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Trace-Id"],  # Let the frontend read request traces
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Recent opt-in request traces, kept so streamed requests can be inspected after they finish
+trace_buffer = TraceBuffer(max_traces=TRACE_BUFFER_SIZE)
 
-# Initialize Supabase client
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Record request latency per route; trace the request when the client sends the trace header."""
+    trace = Trace() if request.headers.get(TRACE_HEADER) else None
+    token = current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_trace.reset(token)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    http_request_seconds.observe(elapsed, method=request.method, route=getattr(route, "path", "unmatched"), status=str(response.status_code))
+    if trace is not None:
+        trace.add_span("total", elapsed)
+        trace_buffer.add(trace)
+        # For streamed responses this covers work up to the first byte; GET /api/traces/{id} has the rest
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["X-Trace-Id"] = trace.trace_id
+    return response
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    app.state.event_loop_monitor = asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL_SECONDS))
+
+def create_supabase_client():
+    # Imported here: supabase and its HTTP stack are slow to import and only reports need them
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+# Supabase client, built on first use or by the startup warm-up
+supabase = LazyResource("supabase", create_supabase_client)
+
+# With a shared state backend (STATE_BACKEND=sqlite) progress, answers, job results and quotes
+# are visible to every worker process; otherwise components keep them in memory only
+shared_state = state_backend if state_backend.shared else None
+
+# Per-job progress tracking, streamed through the state backend's pub/sub
+progress_registry = ProgressRegistry(
+    state_backend, ttl_seconds=PROGRESS_TTL_SECONDS, start_timeout_seconds=PROGRESS_START_TIMEOUT_SECONDS,
 )
 
-# Global progress tracking
-current_progress = {"progress": 0, "status": ""}
+def update_progress(job_id: str, progress: int, status: str):
+    """Update the progress and status of a job."""
+    progress_registry.update(job_id, progress, status)
+    print(f"Progress [{job_id}]: {progress}% - {status}")
 
-def update_progress(progress: int, status: str):
-    """Update the current progress and status."""
-    current_progress["progress"] = progress
-    current_progress["status"] = status
-    print(f"Progress: {progress}% - {status}")
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+}
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a named server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.get("/api/research/progress")
-async def progress_stream():
-    """SSE endpoint for progress updates."""
+async def progress_stream(job_id: Optional[str] = None):
+    """SSE endpoint for progress updates. Defaults to the most recently started job."""
+    job_id = job_id or progress_registry.latest_job_id
+    if job_id is None:
+        raise HTTPException(status_code=404, detail="No job to report progress for")
+
     async def event_generator():
-        while True:
-            if current_progress["progress"] == 100:
-                break
-            
-            # Send progress update
-            data = json.dumps(current_progress)
-            yield f"data: {data}\n\n"
-            
-            await asyncio.sleep(0.5)  # Update every 500ms
+        # Pushes an event whenever the job updates and closes once it completes or fails
+        async for snapshot in progress_registry.subscribe(job_id):
+            yield f"data: {json.dumps(snapshot)}\n\n"
     
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
 
-def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> int:
-    """Returns the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding(encoding_name)
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the LLM response cache."""
+    return response_cache.stats()
 
-def split_text_into_chunks(text: str, max_tokens: int = 3000) -> List[str]:
-    """Split text into chunks of approximately max_tokens."""
-    encoding = tiktoken.get_encoding("cl100k_base")
-    tokens = encoding.encode(text)
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for token in tokens:
-        if current_size >= max_tokens:
-            chunk_text = encoding.decode(current_chunk)
-            chunks.append(chunk_text)
-            current_chunk = []
-            current_size = 0
-        current_chunk.append(token)
-        current_size += 1
-    
-    if current_chunk:
-        chunk_text = encoding.decode(current_chunk)
-        chunks.append(chunk_text)
-    
-    return chunks
+@app.get("/api/state/stats")
+async def state_stats():
+    """Which state backend is in use, with its entry, subscription and event counters."""
+    return state_backend.stats()
 
-def get_embedding(text: str, model="text-embedding-3-small"):
-    text = text.replace("\n", " ")
-    return client.embeddings.create(input=[text], model=model).data[0].embedding
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """LLM gateway queue depth, concurrency limit, throttling and retry counters."""
+    return gateway.stats()
 
-def process_text_with_context(text: str, query: str = None) -> str:
-    """Process text while maintaining context for long documents."""
-    # If text is short enough, process directly
-    if num_tokens_from_string(text) <= 3000:
-        return text
-    
-    # Split into chunks if text is too long
-    chunks = split_text_into_chunks(text, max_tokens=2000)  # Smaller chunks for better processing
-    
-    if query:
-        # For questions, we'll process all chunks to ensure we don't miss anything
-        return "\n==========\n".join(chunks)
-    else:
-        # For summary/key points, process all chunks
-        return "\n==========\n".join(chunks)
-
-# AI companies to track
-AI_COMPANIES = [
-    {"symbol": "NVDA", "name": "NVIDIA"},
-    {"symbol": "GOOGL", "name": "Alphabet"},
-    {"symbol": "MSFT", "name": "Microsoft"},
-    {"symbol": "META", "name": "Meta"},
-    {"symbol": "AMD", "name": "AMD"}
-]
-
-# Cache for financial metrics
-financial_metrics_cache = {
-    "data": None,
-    "last_updated": None
-}
+def split_text_into_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split text into chunks of approximately max_tokens."""
+    with span("tokenize"):
+        tokens = encode(text)
+    with span("chunk"):
+        return decode_chunks(tokens, chunk_bounds(tokens, max_tokens, overlap=CHUNK_OVERLAP_TOKENS, snap_to_sentences=CHUNK_SNAP_TO_SENTENCES))
+
+# Tickers to track, from WATCHLIST_FILE or WATCHLIST, defaulting to the main AI companies
+watchlist = load_watchlist(WATCHLIST_FILE, WATCHLIST)
+
+# Financial metrics, served from memory and refreshed in staggered background batches
+# Every refresh also appends to a fixed-size price history per symbol
+price_history = TimeSeriesStore(capacity=TIMESERIES_CAPACITY)
+financial_metrics_cache = FinancialMetricsCache(
+    watchlist,
+    ttl_seconds=FINANCIAL_METRICS_TTL_SECONDS,
+    hot_ttl_seconds=WATCHLIST_HOT_TTL_SECONDS,
+    batch_size=WATCHLIST_BATCH_SIZE,
+    batch_interval=WATCHLIST_BATCH_INTERVAL_SECONDS,
+    viewed_window_seconds=WATCHLIST_VIEWED_WINDOW_SECONDS,
+    max_workers=MARKET_FETCH_WORKERS,
+    history=price_history,
+    shared=shared_state,
+)
+
+@app.on_event("startup")
+async def start_financial_metrics_scheduler():
+    # Start fetching before the first request (usually the health check) arrives
+    financial_metrics_cache.ensure_started()
 
 @app.get("/api/financial-metrics")
-async def get_financial_metrics():
-    """Get financial metrics for AI companies."""
+async def get_financial_metrics(request: Request, symbols: Optional[str] = None, group: Optional[str] = None):
+    """Get financial metrics for the watchlist, optionally only comma-separated `symbols` and/or a `group`."""
     try:
-        # Check cache (refresh every 5 minutes)
-        current_time = datetime.now()
-        if (financial_metrics_cache["data"] is not None and 
-            financial_metrics_cache["last_updated"] is not None and 
-            (current_time - financial_metrics_cache["last_updated"]).seconds < 300):
-            # Return cached data with caching headers
-            return {
-                "data": financial_metrics_cache["data"],
-                "cache_control": "public, max-age=300",  # Cache for 5 minutes
-                "last_modified": financial_metrics_cache["last_updated"].isoformat()
-            }
-
-        print("Fetching fresh financial metrics...")
-        metrics = []
-        for company in AI_COMPANIES:
-            try:
-                stock = yf.Ticker(company["symbol"])
-                info = stock.fast_info  # Using fast_info instead of info for quicker response
-                metrics.append({
-                    "symbol": company["symbol"],
-                    "name": company["name"],
-                    "price": info.last_price if hasattr(info, 'last_price') else 0,
-                    "change": info.regular_market_price_change_percent if hasattr(info, 'regular_market_price_change_percent') else 0,
-                    "marketCap": info.market_cap if hasattr(info, 'market_cap') else 0,
-                    "volume": info.regular_market_volume if hasattr(info, 'regular_market_volume') else 0
-                })
-                print(f"Successfully fetched data for {company['name']}")
-            except Exception as e:
-                print(f"Error fetching data for {company['name']}: {e}")
-                metrics.append({
-                    "symbol": company["symbol"],
-                    "name": company["name"],
-                    "price": 0,
-                    "change": 0,
-                    "marketCap": 0,
-                    "volume": 0
-                })
-
-        # Update cache
-        financial_metrics_cache["data"] = metrics
-        financial_metrics_cache["last_updated"] = current_time
-        
-        # Return fresh data with caching headers
-        return {
-            "data": metrics,
-            "cache_control": "public, max-age=300",  # Cache for 5 minutes
-            "last_modified": current_time.isoformat()
-        }
+        companies = financial_metrics_cache.select(symbols.split(",") if symbols else None, group)
+        if symbols:
+            # Explicitly requested symbols are refreshed more often for a while; unfiltered
+            # requests (the dashboard default and the health check) don't count as views
+            financial_metrics_cache.mark_viewed(company["symbol"] for company in companies)
+        data = await financial_metrics_cache.get(companies)
+        last_modified = financial_metrics_cache.last_modified(companies)
+        stale = financial_metrics_cache.is_stale(companies)
+        cache_control = f"public, max-age={HTTP_CACHE_MAX_AGE_SECONDS}, stale-while-revalidate={HTTP_CACHE_STALE_SECONDS}"
+        # The ETag comes from when each quote was fetched, so revalidation never serializes the quotes
+        etag = make_etag(stale, *(
+            f"{company['symbol']}@{financial_metrics_cache.fetched_at.get(company['symbol'])}" for company in companies
+        ))
+        return cached_json_response(request, etag, last_modified, cache_control, lambda: {
+            "data": data,
+            "cache_control": cache_control,
+            "last_modified": (last_modified or datetime.now(timezone.utc)).isoformat(),
+            "stale": stale,
+        })
     except Exception as e:
         print(f"Error in get_financial_metrics: {e}")
-        # If there's an error but we have cached data, return it
-        if financial_metrics_cache["data"] is not None:
-            return {
-                "data": financial_metrics_cache["data"],
-                "cache_control": "public, max-age=300",
-                "last_modified": financial_metrics_cache["last_updated"].isoformat() if financial_metrics_cache["last_updated"] else current_time.isoformat()
-            }
         raise HTTPException(status_code=500, detail=str(e))
 
-class Document(BaseModel):
-    title: str
-    content: str
-    type: str
-    url: Optional[str] = None
-    date: Optional[str] = None
-
-class Entity(BaseModel):
-    name: str
-    type: str
-
-class Summary(BaseModel):
-    title: str
-    summary: str
-    key_points: List[str]
-    entities: List[Entity]
-    timestamp: str
-    source_url: Optional[str] = None
-    event_date: Optional[str] = None
-
-class Question(BaseModel):
-    question: str
-    context_id: str
-    document_content: str
-    question_id: str
-
-class Answer(BaseModel):
-    answer: str
-    status: str = "complete"
-
-# Dictionary to store pending answers
-pending_answers = {}
-
-def extract_entities(content: str) -> List[Entity]:
-    """Extract named entities using OpenAI."""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Extract key entities (people, organizations, technologies) from the text. Return them in this format: Entity Name (Type)"},
-                {"role": "user", "content": content}
-            ],
-            temperature=0.3,
-        )
-        entities_text = response.choices[0].message.content
-        entities = []
-        for line in entities_text.split('\n'):
-            if '(' in line and ')' in line:
-                name = line.split('(')[0].strip()
-                type_ = line.split('(')[1].split(')')[0].strip()
-                entities.append(Entity(name=name, type=type_))
-        return entities
-    except Exception as e:
-        print(f"Error extracting entities: {e}")
-        return []
+@app.get("/api/financial-metrics/stats")
+async def financial_metrics_stats():
+    return {**financial_metrics_cache.stats(), "history": price_history.stats()}
+
+@app.get("/api/financial-metrics/history")
+async def get_financial_history(symbol: str, minutes: Optional[float] = None, window: int = 12):
+    """Recorded price history for one symbol over the last `minutes`, with rolling stats over `window` samples."""
+    financial_metrics_cache.mark_viewed([symbol.upper()])
+    series = price_history.get(symbol.upper())
+    if series is None:
+        raise HTTPException(status_code=404, detail=f"No history recorded for {symbol}")
+    since = time.time() - minutes * 60 if minutes is not None else None
+    timestamps, prices, volumes = series.window(since)
+    return {
+        "symbol": symbol.upper(),
+        "points": {"timestamps": timestamps.tolist(), "prices": prices.tolist(), "volumes": volumes.tolist()},
+        "stats": rolling_stats(timestamps, prices, volumes, window),
+    }
+
+# Background jobs for long-running uploads and reports
+job_queue = JobQueue(workers=JOB_WORKERS, max_depth=JOB_QUEUE_DEPTH, ttl_seconds=JOB_TTL_SECONDS, shared=shared_state)
+
+# Completed answers for polling clients, bounded and TTL-evicted, plus in-flight deduplication
+answer_store = AnswerStore(
+    max_entries=ANSWER_STORE_MAX_ENTRIES, max_bytes=ANSWER_STORE_MAX_BYTES, ttl_seconds=ANSWER_TTL_SECONDS, shared=shared_state,
+)
 
-def generate_summary(content: str) -> str:
-    """Generate a structured summary using OpenAI."""
-    try:
-        # If content is too long, process it in chunks
-        if num_tokens_from_string(content) > 3000:
-            chunks = split_text_into_chunks(content)
-            chunk_summaries = []
-            
-            # Generate summary for each chunk
-            for i, chunk in enumerate(chunks):
-                print(f"Generating summary for chunk {i + 1}/{len(chunks)}...")
-                response = client.chat.completions.create(
-                    model="gpt-4",  # Using GPT-4 for better structure
-                    messages=[
-                        {"role": "system", "content": """Generate a structured summary of the text section with clear subtitles.
-                            Use the following format:
-                            
-                            ## Main Points
-                            [Summary of main points]
-                            
-                            ## Key Developments
-                            [Important developments or announcements]
-                            
-                            ## Impact & Implications
-                            [Analysis of potential impacts]
-                            
-                            ## Notable Details
-                            [Any other significant details]
-                            
-                            Make each section concise but informative. Use bullet points where appropriate."""},
-                        {"role": "user", "content": chunk}
-                    ],
-                    temperature=0.5,
-                )
-                chunk_summaries.append(response.choices[0].message.content)
-            
-            # Combine chunk summaries into a final summary
-            combined_summary = "\n\n".join(chunk_summaries)
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": """Create a cohesive final summary from these section summaries.
-                        Maintain the structured format with clear sections:
-                        
-                        # Executive Overview
-                        [Brief overview of the entire content]
-                        
-                        ## Key Findings
-                        [Main takeaways and findings]
-                        
-                        ## Strategic Implications
-                        [Important implications and impacts]
-                        
-                        ## Detailed Analysis
-                        [Breakdown of major points]
-                        
-                        ## Additional Insights
-                        [Other relevant information]
-                        
-                        Ensure the summary is well-organized and eliminates redundancy."""},
-                    {"role": "user", "content": combined_summary}
-                ],
-                temperature=0.5,
-            )
-            return response.choices[0].message.content
-        else:
-            # For shorter content, process directly with the same structured format
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": """Create a structured summary with clear sections:
-                        
-                        # Executive Overview
-                        [Brief overview of the content]
-                        
-                        ## Key Findings
-                        [Main takeaways and findings]
-                        
-                        ## Strategic Implications
-                        [Important implications and impacts]
-                        
-                        ## Detailed Analysis
-                        [Breakdown of major points]
-                        
-                        ## Additional Insights
-                        [Other relevant information]
-                        
-                        Make each section concise but informative."""},
-                    {"role": "user", "content": content}
-                ],
-                temperature=0.5,
-            )
-            return response.choices[0].message.content
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        return "Error generating summary"
+# Uploaded documents with their tokens, chunks and embeddings, keyed by context_id
+document_store = DocumentStore(max_documents=DOCUMENT_STORE_MAX_DOCUMENTS, max_tokens=DOCUMENT_STORE_MAX_TOKENS)
 
-def extract_key_points(content: str) -> List[str]:
-    """Extract key points using OpenAI."""
-    try:
-        # If content is too long, process it in chunks
-        if num_tokens_from_string(content) > 3000:
-            chunks = split_text_into_chunks(content)
-            all_points = []
-            
-            # Extract key points from each chunk
-            for i, chunk in enumerate(chunks):
-                print(f"Extracting key points from chunk {i + 1}/{len(chunks)}...")
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "Extract 2-3 key points from this section of text. Return them as a bullet-pointed list."},
-                        {"role": "user", "content": chunk}
-                    ],
-                    temperature=0.3,
-                )
-                points = response.choices[0].message.content.split('\n')
-                all_points.extend([point.replace('•', '').replace('-', '').strip() for point in points if point.strip()])
-            
-            # Combine and deduplicate key points
-            if len(all_points) > 5:
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "From these key points, create a final list of 3-5 most important points, combining similar points and eliminating redundancy:"},
-                        {"role": "user", "content": "\n".join(all_points)}
-                    ],
-                    temperature=0.3,
-                )
-                final_points = response.choices[0].message.content.split('\n')
-                return [point.replace('•', '').replace('-', '').strip() for point in final_points if point.strip()]
-            return all_points
-        else:
-            # For shorter content, process directly
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Extract 3-5 key points from the text. Return them as a bullet-pointed list."},
-                    {"role": "user", "content": content}
-                ],
-                temperature=0.3,
-            )
-            points = response.choices[0].message.content.split('\n')
-            return [point.replace('•', '').replace('-', '').strip() for point in points if point.strip()]
-    except Exception as e:
-        print(f"Error extracting key points: {e}")
-        return []
+# Previous revision's LLM responses per document_id, so a resubmission only pays for what changed
+analysis_memos = AnalysisMemoStore(
+    max_documents=ANALYSIS_MEMO_MAX_DOCUMENTS, max_bytes=ANALYSIS_MEMO_MAX_BYTES, ttl_seconds=ANALYSIS_MEMO_TTL_SECONDS,
+    shared=shared_state,
+)
+
+def content_defined_boundaries(document_id: Optional[str]) -> bool:
+    """Content-defined cuts only help when a later revision can reuse the chunks."""
+    return CONTENT_DEFINED_BOUNDARIES and document_id is not None
+
+def load_analysis_memo(document_id: Optional[str]) -> Optional[AnalysisMemo]:
+    return analysis_memos.load(document_id) if document_id else None
+
+def save_analysis_memo(document_id: Optional[str], memo: Optional[AnalysisMemo]):
+    if memo is not None:
+        analysis_memos.save(document_id, memo)
+        print(f"Document {document_id}: reused {memo.reused} LLM responses, made {memo.computed} new calls")
+
+async def prepare_document(document: Document, job_id: str) -> Tuple[str, List[str]]:
+    """Register the document for follow-up questions and return its context_id and analysis chunks."""
+    update_progress(job_id, 10, "Processing content...")
+    # The document is tokenized once, off the event loop; every stage reuses its token array
+    context_id = str(uuid.uuid4())
+    stored = document_store.add(await asyncio.to_thread(StoredDocument, context_id, document.title, document.content))
+    chunks = await asyncio.to_thread(stored.split, CHUNK_TOKENS, content_defined_boundaries(document.document_id))
+    return context_id, chunks
+
+def build_summary(document: Document, results: dict, job_id: str, context_id: Optional[str]) -> Summary:
+    return Summary(
+        title=document.title,
+        summary=results["summary"],
+        key_points=results["key_points"],
+        entities=results["entities"],
+        timestamp=datetime.now().isoformat(),
+        source_url=document.url,
+        event_date=document.date,
+        job_id=job_id,
+        context_id=context_id
+    )
+
+async def analyze_document(document: Document, job_id: str) -> Summary:
+    """Run the upload analysis for an already started progress job."""
+    update_progress(job_id, 0, "Starting document analysis...")
+    print(f"Processing document: {document.title}")
+    context_id, chunks = await prepare_document(document, job_id)
+    
+    def on_progress(fraction: float, status: str):
+        # Distribute 70% progress across the pipeline stages
+        update_progress(job_id, 20 + int(70 * fraction), status)
+    
+    # Summary, key points and entities don't depend on each other, so the pipeline runs them together
+    update_progress(job_id, 20, "Generating summary, key points and entities...")
+    memo = load_analysis_memo(document.document_id)
+    pipeline = AnalysisPipeline(document.content, chunks, on_progress=on_progress, memo=memo)
+    results = await pipeline.run("summary", "key_points", "entities")
+    save_analysis_memo(document.document_id, memo)
+    
+    update_progress(job_id, 100, "Analysis complete!")
+    return build_summary(document, results, job_id, context_id)
 
 @app.post("/api/research/upload")
 async def process_document(document: Document) -> Summary:
+    job_id = progress_registry.start(document.job_id)
     try:
-        update_progress(0, "Starting document analysis...")
-        print(f"Processing document: {document.title}")
-        
-        update_progress(10, "Processing content...")
-        processed_content = process_text_with_context(document.content)
-        
-        # Calculate total chunks for progress tracking
-        chunks = split_text_into_chunks(processed_content) if num_tokens_from_string(processed_content) > 3000 else [processed_content]
-        total_chunks = len(chunks)
-        chunk_progress = 60 / (total_chunks * 3)  # Distribute 60% progress across all chunk operations
-        
-        update_progress(20, "Generating summary...")
-        summary_text = ""
-        if total_chunks > 1:
-            chunk_summaries = []
-            for i, chunk in enumerate(chunks):
-                progress = 20 + (i + 1) * chunk_progress
-                update_progress(int(progress), f"Generating summary for section {i + 1}/{total_chunks}...")
-                response = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": """Generate a structured summary of the text section with clear subtitles.
-                            Use the following format:
-                            
-                            ## Main Points
-                            [Summary of main points]
-                            
-                            ## Key Developments
-                            [Important developments or announcements]
-                            
-                            ## Impact & Implications
-                            [Analysis of potential impacts]
-                            
-                            ## Notable Details
-                            [Any other significant details]
-                            
-                            Make each section concise but informative. Use bullet points where appropriate."""},
-                        {"role": "user", "content": chunk}
-                    ],
-                    temperature=0.5,
-                )
-                chunk_summaries.append(response.choices[0].message.content)
-            
-            update_progress(40, "Combining summaries...")
-            combined_summary = "\n\n".join(chunk_summaries)
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": """Create a cohesive final summary from these section summaries.
-                        Maintain the structured format with clear sections:
-                        
-                        # Executive Overview
-                        [Brief overview of the entire content]
-                        
-                        ## Key Findings
-                        [Main takeaways and findings]
-                        
-                        ## Strategic Implications
-                        [Important implications and impacts]
-                        
-                        ## Detailed Analysis
-                        [Breakdown of major points]
-                        
-                        ## Additional Insights
-                        [Other relevant information]
-                        
-                        Ensure the summary is well-organized and eliminates redundancy."""},
-                    {"role": "user", "content": combined_summary}
-                ],
-                temperature=0.5,
-            )
-            summary_text = response.choices[0].message.content
-        else:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": """Create a structured summary with clear sections:
-                        
-                        # Executive Overview
-                        [Brief overview of the content]
-                        
-                        ## Key Findings
-                        [Main takeaways and findings]
-                        
-                        ## Strategic Implications
-                        [Important implications and impacts]
-                        
-                        ## Detailed Analysis
-                        [Breakdown of major points]
-                        
-                        ## Additional Insights
-                        [Other relevant information]
-                        
-                        Make each section concise but informative."""},
-                    {"role": "user", "content": processed_content}
-                ],
-                temperature=0.5,
-            )
-            summary_text = response.choices[0].message.content
-        
-        update_progress(50, "Extracting key points...")
-        key_points = extract_key_points(processed_content)
-        
-        update_progress(80, "Extracting entities...")
-        entities = extract_entities(processed_content)
-        
-        update_progress(100, "Analysis complete!")
-        
-        return Summary(
-            title=document.title,
-            summary=summary_text,
-            key_points=key_points,
-            entities=entities,
-            timestamp=datetime.now().isoformat(),
-            source_url=document.url,
-            event_date=document.date
-        )
+        return await analyze_document(document, job_id)
     except Exception as e:
         print(f"Error processing document: {e}")
-        update_progress(0, f"Error: {str(e)}")
+        progress_registry.fail(job_id, f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/research/question")
-async def answer_question(question: Question) -> Answer:
+@app.post("/api/research/upload/stream")
+async def process_document_stream(document: Document):
+    """Streaming upload: SSE stage events while chunks are analyzed, then the final summary's tokens."""
+    job_id = progress_registry.start(document.job_id)
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(fraction: float, status: str):
+        progress = 20 + int(70 * fraction)
+        update_progress(job_id, progress, status)
+        events.put_nowait(sse_event("stage", {"progress": progress, "status": status}))
+
+    async def analyze():
+        try:
+            print(f"Processing document (streaming): {document.title}")
+            context_id, chunks = await prepare_document(document, job_id)
+            memo = load_analysis_memo(document.document_id)
+            pipeline = AnalysisPipeline(
+                document.content, chunks, on_progress=on_progress, memo=memo,
+                on_token=lambda text: events.put_nowait(sse_event("token", {"text": text})),
+            )
+            results = await pipeline.run("summary", "key_points", "entities")
+            save_analysis_memo(document.document_id, memo)
+            update_progress(job_id, 100, "Analysis complete!")
+            events.put_nowait(sse_event("done", build_summary(document, results, job_id, context_id).model_dump()))
+        except Exception as e:
+            print(f"Error processing document: {e}")
+            progress_registry.fail(job_id, f"Error: {str(e)}")
+            events.put_nowait(sse_event("error", {"detail": str(e)}))
+        finally:
+            events.put_nowait(None)
+
+    async def event_generator():
+        task = asyncio.create_task(analyze())
+        try:
+            yield sse_event("stage", {"progress": 0, "status": "Starting document analysis...", "job_id": job_id})
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            # Stop spending LLM calls if the client disconnects
+            task.cancel()
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/research/upload/file")
+async def process_document_file(request: Request, title: Optional[str] = None, type: str = "document",
+                                url: Optional[str] = None, date: Optional[str] = None,
+                                job_id: Optional[str] = None, document_id: Optional[str] = None,
+                                keep_context: bool = False) -> Summary:
+    """Upload a document as a multipart file (or raw UTF-8 body) and analyze it while it arrives.
+
+    title, type, url and date can be form fields or query parameters; job_id is a query
+    parameter so progress can be followed from the start, and document_id (also a query
+    parameter) reuses the previous revision's results. The body is decoded, tokenized and
+    chunked block by block, and each chunk is analyzed as soon as it's complete, so memory
+    stays proportional to the chunk size. keep_context=true also keeps the token array and
+    returns a context_id for follow-up questions, which costs memory proportional to the document.
+    """
+    job_id = progress_registry.start(job_id)
+    fields: Dict[str, Optional[str]] = {"title": title, "type": type, "url": url, "date": date}
+    ingest = StreamingDocument(CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS, snap_to_sentences=CHUNK_SNAP_TO_SENTENCES,
+                               content_defined=content_defined_boundaries(document_id), keep_tokens=keep_context)
+    feed = ChunkFeed(STREAM_UPLOAD_MAX_PENDING_CHUNKS)
+    reported = 0
+
+    def report(progress: int, status: str):
+        # Chunk counts grow while the upload runs, so only ever move progress forward
+        nonlocal reported
+        reported = max(reported, progress)
+        update_progress(job_id, reported, status)
+
+    memo = load_analysis_memo(document_id)
+    pipeline = AnalysisPipeline("", [], chunk_feed=feed, extraction_mode="structured", memo=memo,
+                                on_progress=lambda fraction, status: report(20 + int(70 * fraction), status))
+    analysis = asyncio.create_task(pipeline.run("summary", "key_points", "entities"))
+
+    async def hand_over(put: Awaitable[None]):
+        # If the analysis fails it stops reading the feed; surface its error instead of waiting forever
+        put = asyncio.ensure_future(put)
+        await asyncio.wait({put, analysis}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            analysis.result()
+
+    async def hand_over_chunks(chunks: List[str]):
+        for chunk in chunks:
+            await hand_over(feed.put(chunk))
+
     try:
-        print(f"Processing question: {question.question}")
-        print(f"Question ID: {question.question_id}")
-        
-        # Check if we already have an answer for this question
-        if question.question_id in pending_answers:
-            answer = pending_answers[question.question_id]
-            if answer["status"] == "complete":
-                # Remove from pending and return the answer
-                result = Answer(**pending_answers.pop(question.question_id))
-                return result
-            else:
-                # Still processing
-                return Answer(answer="", status="processing")
-        
-        # Get all document content in chunks
-        chunks = split_text_into_chunks(question.document_content, max_tokens=2000)
-        total_chunks = len(chunks)
-        
-        if total_chunks == 1:
-            # If document is small enough, process it directly
-            relevant_content = chunks[0]
+        report(5, "Receiving document...")
+        async for block in upload_blocks(request, fields):
+            await hand_over_chunks(await asyncio.to_thread(ingest.feed, block))
+        await hand_over_chunks(await asyncio.to_thread(ingest.finish))
+        if ingest.token_count == 0:
+            raise HTTPException(status_code=400, detail="The uploaded document is empty")
+        await hand_over(feed.close())
+        print(f"Received {ingest.byte_count} bytes ({ingest.token_count} tokens) for job {job_id}")
+        document = Document(title=fields["title"] or fields.get("filename") or "Untitled", content="",
+                            type=fields["type"] or "document", url=fields["url"], date=fields["date"],
+                            job_id=job_id, document_id=document_id)
+        context_id = None
+        if keep_context:
+            # Kept as tokens only; question chunks are decoded when a question reads them
+            context_id = str(uuid.uuid4())
+            document_store.add(await asyncio.to_thread(
+                StoredDocument, context_id, document.title, "", tokens=ingest.tokens(), content_hash=ingest.content_hash,
+            ))
+        results = await analysis
+        save_analysis_memo(document_id, memo)
+        update_progress(job_id, 100, "Analysis complete!")
+        return build_summary(document, results, job_id, context_id)
+    except Exception as e:
+        analysis.cancel()
+        print(f"Error processing uploaded file: {e}")
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        progress_registry.fail(job_id, f"Error: {detail}")
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def scan_chunks_for_answer(question: str, chunks: List[str], model: str = SCAN_MODEL) -> List[Optional[str]]:
+    """Ask the model to check every chunk for relevant quotes. Returns the quotes per chunk, None where nothing is relevant."""
+    print(f"Scanning {len(chunks)} chunks for potential answers with {model}...")
+    chunk_results = await asyncio.gather(*(
+        chat_completion(
+            model=model,
+            messages=[
+                {"role": "system", "content": """Analyze this text section and determine if it contains information relevant to the question.
+                    If it contains relevant information, extract and quote the specific parts that answer the question.
+                    If it doesn't contain relevant information, respond with "NO_RELEVANT_INFO"."""},
+                {"role": "user", "content": f"""Question: {question}
+                    
+                    Text section:
+                    {chunk}"""}
+            ],
+            temperature=0.3,
+        )
+        for chunk in chunks
+    ))
+    # Cheaper models sometimes wrap the marker in punctuation or explanation
+    return [None if "NO_RELEVANT_INFO" in result else result for result in chunk_results]
+
+async def document_embeddings(document: StoredDocument) -> np.ndarray:
+    """Chunk embeddings, computed once per stored document and reused by later questions.
+
+    Concurrent first questions await the same embedding run; a failed run is retried by the next question.
+    """
+    if document.embeddings is None:
+        if document.embeddings_task is None:
+            document.embeddings_task = asyncio.ensure_future(
+                embed_texts(document.chunks, token_counts=document.chunk_token_counts))
+        task = document.embeddings_task
+        try:
+            # Shield so one client disconnecting doesn't cancel the run others are waiting on
+            document.embeddings = await asyncio.shield(task)
+        except Exception:
+            if document.embeddings_task is task:
+                document.embeddings_task = None
+            raise
+    return document.embeddings
+
+async def retrieve_relevant_chunks(question: str, document: StoredDocument) -> List[str]:
+    """Rank chunks by embedding similarity to the question and keep the best within the token budget."""
+    embeddings = await document_embeddings(document)
+    question_vector = (await embed_texts([question]))[0]
+    with span("retrieval.rank"):
+        scores = cosine_scores(question_vector, embeddings)
+        selected = select_top_chunks(scores, document.chunk_token_counts, RETRIEVAL_TOP_K, RETRIEVAL_TOKEN_BUDGET)
+    print(f"Retrieved chunks {[index + 1 for index in selected]} of {len(document.chunks)}")
+    return [document.chunks[index] for index in selected]
+
+async def cascade_relevant_chunks(question: str, document: StoredDocument, stats: Dict[str, Any]) -> List[str]:
+    """Narrow the chunks through each configured tier, cheapest first, recording how many each tier saw and kept."""
+    candidates = list(range(len(document.chunks)))
+    lexical_scores = None
+    tiers = stats.setdefault("tiers", [])
+    for tier in CASCADE_TIERS:
+        if not candidates:
+            break
+        if tier == "lexical":
+            with span("cascade.lexical"):
+                if document.lexical_index is None:
+                    document.lexical_index = LexicalIndex(document.chunks)
+                lexical_scores = document.lexical_index.scores(question)
+            matches = [index for index in candidates if lexical_scores[index] > 0]
+            # With no word overlap at all the lexical tier can't judge, so leave it to the next tier
+            kept = sorted(sorted(matches, key=lambda index: -lexical_scores[index])[:CASCADE_LEXICAL_TOP_K]) if matches else candidates
+            tiers.append({"tier": "lexical", "chunks_in": len(candidates), "chunks_out": len(kept)})
+        elif tier == "screen":
+            results = await scan_chunks_for_answer(question, [document.chunks[index] for index in candidates], model=SCREEN_MODEL)
+            kept = [index for index, result in zip(candidates, results) if result is not None]
+            tiers.append({"tier": "screen", "model": SCREEN_MODEL, "chunks_in": len(candidates), "chunks_out": len(kept)})
         else:
-            # For larger documents, first find potential answers in each chunk
-            potential_answers = []
-            
-            for i, chunk in enumerate(chunks):
-                print(f"Processing chunk {i + 1}/{total_chunks} for potential answer...")
-                
-                response = client.chat.completions.create(
-                    model="gpt-4",  # Using GPT-4 for better comprehension
-                    messages=[
-                        {"role": "system", "content": """Analyze this text section and determine if it contains information relevant to the question.
-                            If it contains relevant information, extract and quote the specific parts that answer the question.
-                            If it doesn't contain relevant information, respond with "NO_RELEVANT_INFO"."""},
-                        {"role": "user", "content": f"""Question: {question.question}
-                            
-                            Text section:
-                            {chunk}"""}
-                    ],
-                    temperature=0.3,
-                )
-                
-                chunk_result = response.choices[0].message.content
-                if chunk_result != "NO_RELEVANT_INFO":
-                    potential_answers.append(chunk_result)
-            
-            if not potential_answers:
-                return Answer(answer=f"The document does not provide information about {question.question}")
-            
-            # Combine all relevant chunks
-            relevant_content = "\n---\n".join(potential_answers)
-        
-        # Final answer generation with GPT-4
-        prompt = f"""
-        Based on the following relevant information from the document, please answer this question: {question.question}
+            print(f"Ignoring unknown cascade tier {tier!r}")
+            continue
+        candidates = kept
+    if not candidates:
+        return []
+    # Keep the answer call within the retrieval budget, preferring the best lexical matches
+    ranking = lexical_scores[candidates] if lexical_scores is not None else np.zeros(len(candidates))
+    selected = select_top_chunks(ranking, [document.chunk_token_counts[index] for index in candidates], len(candidates), RETRIEVAL_TOKEN_BUDGET)
+    return [document.chunks[candidates[position]] for position in selected]
+
+def resolve_question_document(question: Question) -> StoredDocument:
+    """Look up the tokenized, chunked document instead of re-processing the content."""
+    if question.document_content is not None:
+        return document_store.get_or_register(question.context_id, "", question.document_content)
+    document = document_store.get(question.context_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Unknown context_id {question.context_id}, resend with document_content")
+    return document
+
+async def find_relevant_content(question: Question, document: StoredDocument, stats: Dict[str, Any]) -> Optional[str]:
+    """Document content to answer from, or None when the scan finds nothing relevant. Fills in per-tier chunk counts."""
+    chunks = document.chunks
+    stats["chunks"] = len(chunks)
+    if len(chunks) == 1:
+        # If document is small enough, process it directly
+        stats["mode"] = "direct"
+        stats["answer_chunks"] = 1
+        return chunks[0]
+    mode = question.mode or QUESTION_MODE
+    stats["mode"] = mode
+    if mode == "scan":
+        potential_answers = [result for result in await scan_chunks_for_answer(question.question, chunks) if result is not None]
+        stats["tiers"] = [{"tier": "scan", "model": SCAN_MODEL, "chunks_in": len(chunks), "chunks_out": len(potential_answers)}]
+        stats["answer_chunks"] = len(potential_answers)
+        if not potential_answers:
+            return None
+        # Combine all relevant chunks
+        return "\n---\n".join(potential_answers)
+    if mode == "cascade":
+        relevant_chunks = await cascade_relevant_chunks(question.question, document, stats)
+        stats["answer_chunks"] = len(relevant_chunks)
+        if not relevant_chunks:
+            return None
+        return "\n---\n".join(relevant_chunks)
+    relevant_chunks = await retrieve_relevant_chunks(question.question, document)
+    stats["tiers"] = [{"tier": "embedding", "chunks_in": len(chunks), "chunks_out": len(relevant_chunks)}]
+    stats["answer_chunks"] = len(relevant_chunks)
+    return "\n---\n".join(relevant_chunks)
+
+def answer_messages(question: str, relevant_content: str) -> List[Dict[str, str]]:
+    prompt = f"""
+        Based on the following relevant information from the document, please answer this question: {question}
 
         Relevant document content:
         {relevant_content}
@@ -600,130 +567,438 @@ async def answer_question(question: Question) -> Answer:
         4. Be precise and specific in your answer
         5. Do not make assumptions or add external information
         """
+    return [
+        {"role": "system", "content": """You are a precise document analysis assistant. Your task is to:
+            1. Answer questions based ONLY on the provided document content
+            2. Always quote relevant parts of the document in your answer
+            3. Be very specific and accurate
+            4. If you're not completely certain, say so
+            5. Never make assumptions or add external information"""
+        },
+        {"role": "user", "content": prompt}
+    ]
+
+async def compute_answer(question: Question, document: StoredDocument) -> Answer:
+    stats: Dict[str, Any] = {}
+    relevant_content = await find_relevant_content(question, document, stats)
+    if relevant_content is None:
+        return Answer(answer=f"The document does not provide information about {question.question}", stats=stats)
+    
+    # Final answer generation
+    stats["answer_model"] = ANSWER_MODEL
+    answer = await chat_completion(
+        model=ANSWER_MODEL,
+        messages=answer_messages(question.question, relevant_content),
+        temperature=0.3,
+    )
+    
+    # Store the completed answer for clients polling by question_id
+    answer_store.set(question.question_id, {"answer": answer, "status": "complete"})
+    print(f"Answer generated successfully ({stats})")
+    return Answer(answer=answer, status="complete", stats=stats)
 
-        response = client.chat.completions.create(
-            model="gpt-4",  # Using GPT-4 for final answer
-            messages=[
-                {"role": "system", "content": """You are a precise document analysis assistant. Your task is to:
-                    1. Answer questions based ONLY on the provided document content
-                    2. Always quote relevant parts of the document in your answer
-                    3. Be very specific and accurate
-                    4. If you're not completely certain, say so
-                    5. Never make assumptions or add external information"""
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-        )
-        
-        answer = response.choices[0].message.content
+@app.post("/api/research/question")
+async def answer_question(question: Question) -> Answer:
+    try:
+        print(f"Processing question: {question.question}")
+        print(f"Question ID: {question.question_id}")
         
-        # Store the completed answer
-        pending_answers[question.question_id] = {
-            "answer": answer,
-            "status": "complete"
-        }
+        # Check if we already have an answer for this question
+        stored = answer_store.pop(question.question_id)
+        if stored is not None:
+            return Answer(**stored)
         
-        print("Answer generated successfully")
-        return Answer(answer=answer, status="complete")
+        # Concurrent requests with the same question_id, or the same question about the same
+        # document, share one computation
+        document = resolve_question_document(question)
+        keys = [f"id:{question.question_id}", question_key(document.content_hash, question.question)]
+        return await answer_store.single_flight(keys, lambda: compute_answer(question, document))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error answering question: {e}")
-        # Store the error state
-        pending_answers[question.question_id] = {
-            "answer": f"Error: {str(e)}",
-            "status": "error"
-        }
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/research/question/stream")
+async def answer_question_stream(question: Question):
+    """Streaming question answering: SSE stage events, then answer tokens as the model writes them."""
+    print(f"Processing question (streaming): {question.question}")
+    document = resolve_question_document(question)
+
+    async def event_generator():
+        try:
+            yield sse_event("stage", {"stage": "finding_relevant_content"})
+            stats: Dict[str, Any] = {}
+            relevant_content = await find_relevant_content(question, document, stats)
+            if relevant_content is None:
+                answer = f"The document does not provide information about {question.question}"
+                yield sse_event("token", {"text": answer})
+            else:
+                yield sse_event("stage", {"stage": "answering"})
+                stats["answer_model"] = ANSWER_MODEL
+                parts = []
+                async for text in stream_chat_completion(answer_messages(question.question, relevant_content), model=ANSWER_MODEL, temperature=0.3):
+                    parts.append(text)
+                    yield sse_event("token", {"text": text})
+                answer = "".join(parts)
+            answer_store.set(question.question_id, {"answer": answer, "status": "complete"})
+            yield sse_event("done", Answer(answer=answer, status="complete", stats=stats).model_dump())
+        except Exception as e:
+            print(f"Error answering question: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def report_record(report: dict) -> dict:
+    """The reports table row for a generated report."""
+    return {
+        "id": str(uuid.uuid4()),
+        "title": report["title"],
+        "content": report["content"],
+        "summary": report["summary"],
+        "key_points": report["key_points"],
+        "entities": report["entities"],
+        "source_url": report.get("source_url"),
+        "event_date": report.get("event_date"),
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+def insert_reports(records: List[dict]) -> List[dict]:
+    """Insert report rows in a single request. Blocking, so call it in a thread."""
+    with span("supabase.insert"):
+        result = supabase.get().table("reports").insert(records).execute()
+    return result.data
+
 async def save_report(report: dict) -> dict:
     """Save a report to Supabase."""
     try:
-        report_id = str(uuid.uuid4())
-        report_data = {
-            "id": report_id,
-            "title": report["title"],
-            "content": report["content"],
-            "summary": report["summary"],
-            "key_points": report["key_points"],
-            "entities": report["entities"],
-            "source_url": report.get("source_url"),
-            "event_date": report.get("event_date"),
-            "created_at": datetime.utcnow().isoformat()
-        }
-        
-        result = supabase.table("reports").insert(report_data).execute()
-        return result.data[0]
+        saved = await asyncio.to_thread(insert_reports, [report_record(report)])
+        return saved[0]
     except Exception as e:
         print(f"Error saving report to Supabase: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def fetch_report(report_id: str) -> Optional[dict]:
+    with span("supabase.select"):
+        result = supabase.get().table("reports").select("*").eq("id", report_id).limit(1).execute()
+    return result.data[0] if result.data else None
+
+@app.get("/api/research/reports/{report_id}")
+async def get_report(report_id: str, request: Request):
+    """A saved report. Reports never change once saved, so clients and CDNs may cache them indefinitely."""
+    etag = make_etag("report", report_id)
+    cache_control = "public, max-age=31536000, immutable"
+    # Answer revalidations without a database round trip
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"Cache-Control": cache_control, "ETag": etag})
+    report = await asyncio.to_thread(fetch_report, report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    created_at = datetime.fromisoformat(report["created_at"]) if report.get("created_at") else None
+    if created_at is not None and created_at.tzinfo is None:
+        # save_report stores naive UTC timestamps
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return cached_json_response(request, etag, created_at, cache_control, lambda: report)
+
+async def generate_report_data(document: Document, job_id: str) -> dict:
+    """Generate a report for an already started progress job, without saving it."""
+    update_progress(job_id, 0, "Starting report generation...")
+    
+    # Tokenize and chunk the document once, off the event loop
+    chunks = await asyncio.to_thread(split_text_into_chunks, document.content)
+    
+    def on_progress(fraction: float, status: str):
+        update_progress(job_id, 10 + int(80 * fraction), status)
+    
+    # The report sections share one pipeline, so chunk summaries are computed once for both
+    update_progress(job_id, 10, "Generating summary, key points, entities and report...")
+    pipeline = AnalysisPipeline(document.content, chunks, on_progress=on_progress)
+    results = await pipeline.run("summary", "key_points", "entities", "report")
+    summary, key_points, entities, report_content = (
+        results["summary"], results["key_points"], results["entities"], results["report"]
+    )
+    
+    # Prepare report data
+    report_data = {
+        "title": document.title,
+        "content": report_content,
+        "summary": summary,
+        "key_points": key_points,
+        "entities": [entity.dict() for entity in entities],
+        "source_url": document.url,
+        "event_date": document.date
+    }
+    return report_data
+
+async def build_report(document: Document, job_id: str) -> dict:
+    """Generate and save a report for an already started progress job."""
+    report_data = await generate_report_data(document, job_id)
+    
+    update_progress(job_id, 90, "Saving report...")
+    saved_report = await save_report(report_data)
+    
+    update_progress(job_id, 100, "Report generation complete!")
+    return saved_report
+
 @app.post("/api/research/generate-report")
 async def generate_report(document: Document):
     """Generate and save a comprehensive report."""
+    job_id = progress_registry.start(document.job_id)
     try:
-        update_progress(0, "Starting report generation...")
-        
-        # Process the document content
-        processed_content = process_text_with_context(document.content)
-        
-        update_progress(20, "Generating summary...")
-        summary = generate_summary(processed_content)
-        
-        update_progress(40, "Extracting key points...")
-        key_points_response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "Extract the key points from the text as a list. Focus on the most important insights and findings."},
-                {"role": "user", "content": processed_content}
-            ],
-            temperature=0.3,
-        )
-        key_points = key_points_response.choices[0].message.content.split('\n')
-        key_points = [point.strip('- ').strip() for point in key_points if point.strip()]
-        
-        update_progress(60, "Extracting entities...")
-        entities = extract_entities(processed_content)
-        
-        update_progress(80, "Generating final report...")
-        report_response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": """Generate a comprehensive report in HTML format with the following sections:
-                    1. Executive Summary
-                    2. Key Findings
-                    3. Analysis & Implications
-                    4. Recommendations
-                    5. Technical Details (if applicable)
-                    
-                    Use appropriate HTML tags for structure (h2, p, ul, etc.)."""},
-                {"role": "user", "content": processed_content}
-            ],
-            temperature=0.5,
-        )
-        
-        report_content = report_response.choices[0].message.content
-        
-        # Prepare report data
-        report_data = {
-            "title": document.title,
-            "content": report_content,
-            "summary": summary,
-            "key_points": key_points,
-            "entities": [entity.dict() for entity in entities],
-            "source_url": document.url,
-            "event_date": document.date
-        }
-        
-        update_progress(90, "Saving report...")
-        saved_report = await save_report(report_data)
-        
-        update_progress(100, "Report generation complete!")
-        
-        return saved_report
+        return await build_report(document, job_id)
     except Exception as e:
         print(f"Error generating report: {e}")
+        progress_registry.fail(job_id, f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/research/generate-report/batch")
+async def generate_report_batch(batch: DocumentBatch):
+    """Generate reports for many documents concurrently.
+
+    Streams SSE events: "analyzed" when a document's report is generated, "saved" once it has been
+    written (reports are inserted in bulk), "error" for a failed document and "done" at the end.
+    LLM calls from all documents share the gateway's concurrency and rate limits.
+    """
+    if not batch.documents:
+        raise HTTPException(status_code=400, detail="No documents in batch")
+    if len(batch.documents) > REPORT_BATCH_MAX_DOCUMENTS:
+        raise HTTPException(status_code=413, detail=f"At most {REPORT_BATCH_MAX_DOCUMENTS} documents per batch")
+    job_ids = [progress_registry.start(document.job_id) for document in batch.documents]
+    events: asyncio.Queue = asyncio.Queue()
+    # Bounds how many documents hold their chunks and intermediate results at once
+    document_slots = asyncio.Semaphore(REPORT_BATCH_CONCURRENCY)
+    unsaved: List[Tuple[int, dict]] = []
+    flush_lock = asyncio.Lock()
+    counts = {"saved": 0, "failed": 0}
+
+    def fail(index: int, detail: str):
+        progress_registry.fail(job_ids[index], f"Error: {detail}")
+        counts["failed"] += 1
+        events.put_nowait(sse_event("error", {"index": index, "job_id": job_ids[index], "detail": detail}))
+
+    async def flush(force: bool):
+        async with flush_lock:
+            if not unsaved or (not force and len(unsaved) < REPORT_INSERT_BATCH_SIZE):
+                return
+            pending = unsaved[:]
+            unsaved.clear()
+            try:
+                saved_reports = await asyncio.to_thread(insert_reports, [record for _, record in pending])
+            except Exception as e:
+                print(f"Error saving {len(pending)} reports to Supabase: {e}")
+                for index, _ in pending:
+                    fail(index, str(e))
+                return
+            # Match rows by the id each record was given, so a short response can't pair reports with the wrong documents
+            saved_by_id = {report.get("id"): report for report in saved_reports or []}
+            if len(saved_by_id) != len(pending):
+                print(f"Supabase returned {len(saved_reports or [])} rows for {len(pending)} inserted reports")
+            for index, record in pending:
+                report = saved_by_id.get(record["id"])
+                if report is None:
+                    fail(index, "Report was not confirmed as saved")
+                    continue
+                update_progress(job_ids[index], 100, "Report generation complete!")
+                counts["saved"] += 1
+                events.put_nowait(sse_event("saved", {"index": index, "job_id": job_ids[index], "report": report}))
+
+    async def process(index: int, document: Document):
+        async with document_slots:
+            try:
+                report_data = await generate_report_data(document, job_ids[index])
+            except Exception as e:
+                print(f"Error generating report for {document.title}: {e}")
+                fail(index, str(e))
+                return
+        update_progress(job_ids[index], 90, "Saving report...")
+        events.put_nowait(sse_event("analyzed", {"index": index, "job_id": job_ids[index], "title": document.title}))
+        unsaved.append((index, report_record(report_data)))
+        await flush(force=False)
+
+    async def run():
+        try:
+            await asyncio.gather(*(process(index, document) for index, document in enumerate(batch.documents)))
+            await flush(force=True)
+            events.put_nowait(sse_event("done", {"documents": len(batch.documents), **counts}))
+        finally:
+            events.put_nowait(None)
+
+    async def event_generator():
+        task = asyncio.create_task(run())
+        try:
+            yield sse_event("started", {"documents": len(batch.documents), "job_ids": job_ids})
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            # Stop spending LLM calls if the client disconnects
+            task.cancel()
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def submit_job(kind: str, document: Document, run: Callable[[Document, str], Awaitable[Any]]) -> JSONResponse:
+    """Queue a heavy job and return 202 with its ID, 409 when the job_id is taken, or 429 when the queue is full."""
+    async def run_job(job_id: str):
+        try:
+            result = await run(document, job_id)
+        except Exception as e:
+            progress_registry.fail(job_id, f"Error: {str(e)}")
+            raise
+        return result.model_dump() if isinstance(result, BaseModel) else result
+
+    try:
+        job = job_queue.submit(kind, run_job, job_id=document.job_id)
+    except JobExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(JOB_RETRY_AFTER_SECONDS)})
+    progress_registry.start(job.job_id)
+    update_progress(job.job_id, 0, f"Queued ({job_queue.depth} jobs waiting)")
+    return JSONResponse(status_code=202, content={"job_id": job.job_id, "status": job.status})
+
+@app.post("/api/research/jobs/upload")
+async def submit_upload_job(document: Document):
+    """Queue document analysis; poll /api/research/jobs/{job_id} for the Summary."""
+    return submit_job("upload", document, analyze_document)
+
+@app.post("/api/research/jobs/generate-report")
+async def submit_report_job(document: Document):
+    """Queue report generation; poll /api/research/jobs/{job_id} for the saved report."""
+    return submit_job("generate-report", document, build_report)
+
+@app.get("/api/research/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued job, with its result once complete."""
+    job = job_queue.lookup(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return {**job, "progress": progress_registry.get(job_id)}
+
+# Component state exported as gauges, refreshed on every scrape
+llm_gateway_gauge = registry.register(Gauge("llm_gateway", "LLM gateway queue depth, in-flight requests and concurrency limit", ["state"]))
+llm_rate_limit_wait = registry.register(Gauge(
+    "llm_rate_limit_wait_seconds_total", "Time spent waiting for RPM/TPM budget", metric_type="counter"))
+llm_cache_lookups = registry.register(Gauge(
+    "llm_cache_lookups_total", "LLM response cache lookups by result", ["result"], metric_type="counter"))
+store_gauge = registry.register(Gauge("store_size", "Entries held by in-memory stores", ["store"]))
+answers_coalesced = registry.register(Gauge(
+    "answers_coalesced_total", "Question requests that joined an in-flight computation", metric_type="counter"))
+analysis_memo_calls = registry.register(Gauge(
+    "analysis_memo_calls_total", "Pipeline LLM calls on documents with a document_id, by whether the previous revision's response was reused",
+    ["result"], metric_type="counter"))
+financial_metrics_gauge = registry.register(Gauge("financial_metrics_symbols", "Watchlist symbols by cache state", ["state"]))
+
+def collect_component_metrics():
+    gateway_stats = gateway.stats()
+    for state in ("queue_depth", "in_flight", "concurrency_limit"):
+        llm_gateway_gauge.set(gateway_stats[state], state=state)
+    llm_rate_limit_wait.set(gateway_stats["rate_limit_wait_seconds"])
+    cache_stats = response_cache.stats()
+    for result in ("memory_hits", "disk_hits", "misses"):
+        llm_cache_lookups.set(cache_stats[result], result=result)
+    store_gauge.set(len(document_store.documents), store="documents")
+    store_gauge.set(document_store.total_tokens, store="document_tokens")
+    store_gauge.set(answer_store.stats()["entries"], store="answers")
+    store_gauge.set(job_queue.depth, store="queued_jobs")
+    memo_stats = analysis_memos.stats()
+    store_gauge.set(memo_stats["entries"], store="analysis_memo_entries")
+    store_gauge.set(memo_stats["bytes"], store="analysis_memo_bytes")
+    analysis_memo_calls.set(memo_stats["reused"], result="reused")
+    analysis_memo_calls.set(memo_stats["computed"], result="computed")
+    answers_coalesced.set(answer_store.coalesced)
+    market_stats = financial_metrics_cache.stats()
+    financial_metrics_gauge.set(market_stats["cached"], state="cached")
+    financial_metrics_gauge.set(market_stats["stale"], state="stale")
+
+registry.add_collector(collect_component_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, stage, LLM, cache, yfinance and event loop metrics."""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """A recent request trace, by the X-Trace-Id returned when the request sent the trace header."""
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired trace {trace_id}")
+    return trace.to_dict()
+
+startup_timings_gauge = registry.register(Gauge(
+    "startup_phase_seconds", "Import, startup and warm-up durations of this process", ["phase"]))
+
+def collect_startup_metrics():
+    for phase, seconds in startup_timings.snapshot().items():
+        startup_timings_gauge.set(seconds, phase=phase)
+
+registry.add_collector(collect_startup_metrics)
+
+# Warm-up step -> "pending", "ok" or the last error
+warmup_status: Dict[str, str] = {}
+
+def warmup_steps() -> List[Tuple[str, Callable[[], Any]]]:
+    steps = [("tokenizer", lambda: warm_up_tokenizer(CHUNK_SNAP_TO_SENTENCES))]
+    # Unconfigured clients would only fail; /readyz reports the missing settings instead
+    if OPENAI_API_KEY:
+        steps.append(("openai", async_client.get))
+    if SUPABASE_URL and SUPABASE_SERVICE_KEY:
+        steps.append(("supabase", supabase.get))
+    return steps
+
+async def warm_up():
+    """Load the tokenizer and build API clients in threads, retrying failures, so first requests don't pay for them."""
+    pending = warmup_steps()
+    for name, _ in pending:
+        warmup_status[name] = "pending"
+    while pending:
+        failed = []
+        for name, step in pending:
+            try:
+                with startup_timings.phase(f"warmup.{name}"):
+                    await asyncio.to_thread(step)
+                warmup_status[name] = "ok"
+            except Exception as e:
+                print(f"Warm-up of {name} failed, retrying in {WARMUP_RETRY_SECONDS:.0f}s: {e}")
+                warmup_status[name] = str(e)
+                failed.append((name, step))
+        pending = failed
+        if pending:
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    print(f"Warm-up complete {startup_timings.uptime_seconds():.2f}s after import: {startup_timings.snapshot()}")
+
+@app.on_event("startup")
+async def start_warm_up():
+    startup_timings.mark("server.startup")
+    if WARMUP_ON_STARTUP:
+        app.state.warm_up = asyncio.create_task(warm_up())
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving. Touches nothing else."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: configured, and (with warm-up on) the tokenizer and OpenAI client are loaded."""
+    missing = [] if OPENAI_API_KEY else ["OPENAI_API_KEY"]
+    required = ["tokenizer", "openai"] if WARMUP_ON_STARTUP else []
+    ready = not missing and all(warmup_status.get(name) == "ok" for name in required)
+    body = {"status": "ready" if ready else "not_ready", "missing_settings": missing, "warmup": warmup_status}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/api/startup/stats")
+async def startup_stats():
+    """Import, startup and warm-up time breakdown, plus which lazy modules and clients have loaded."""
+    from market import yfinance
+    return {
+        "uptime_seconds": round(startup_timings.uptime_seconds(), 3),
+        "phases": startup_timings.snapshot(),
+        "warmup": warmup_status,
+        "loaded": {resource.name: resource.loaded for resource in (async_client, supabase, yfinance)},
+    }
+
+startup_timings.mark("init.state")
+
 if __name__ == "__main__":
     print("Starting AI News App backend server...")
     uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
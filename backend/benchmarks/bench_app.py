@@ -0,0 +1,232 @@
+"""End-to-end benchmark of upload, question and report against the local fake OpenAI server.
+
+Starts benchmarks/fake_openai.py in a subprocess, points the app at it and drives the endpoints
+in-process. For each document size and scenario it reports wall time, LLM calls, approximate
+prompt/completion tokens and peak Python memory growth (tracemalloc). Nothing leaves the machine, but
+tiktoken needs the cl100k_base file; on an offline CI box set TIKTOKEN_CACHE_DIR to a
+directory where it has been cached.
+
+The gateway's RPM/TPM budgets default to effectively unlimited here so the fake latency
+dominates; set LLM_DEFAULT_RPM / LLM_DEFAULT_TPM to benchmark with throttling.
+
+With --baseline (a --json file from an earlier run, e.g. of the main branch on the same
+machine), each result is compared with the baseline's and the run exits with status 1 when
+any metric grows past REGRESSION_LIMITS or a request that succeeded before now fails.
+
+Run from the backend directory:
+    python benchmarks/bench_app.py --sizes 1000,10000,100000,500000 --json results.json
+    python benchmarks/bench_app.py --sizes 1000,10000,100000 --baseline main.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SENTENCES = [
+    "Revenue for the quarter grew {n} percent year over year, driven by data center demand.",
+    "Management said supply of accelerators would improve through the second half of year {n}.",
+    "Analysts asked about gross margin, which came in at {n} percent against guidance.",
+    "The company announced partnership number {n} with a cloud provider to expand inference capacity.",
+    "Operating expenses rose {n} percent as the company invested in research and new products!",
+    "Asked about regulation, executives pointed to export rules affecting {n} customers?",
+]
+QUESTION = "What did management say about gross margin and supply?"
+
+# Largest allowed growth over the baseline per metric: (relative, absolute). A result regresses
+# only when it exceeds both, so tiny baselines aren't failed over noise. Call and token counts are
+# deterministic against the fake server; wall time and memory get more room.
+REGRESSION_LIMITS = {
+    "llm_calls": (0.10, 1),
+    "prompt_tokens": (0.10, 500),
+    "completion_tokens": (0.10, 500),
+    "wall_seconds": (0.25, 0.5),
+    "peak_memory_mb": (0.25, 5.0),
+}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def make_document(target_tokens: int, seed: int) -> str:
+    """Synthetic transcript of exactly target_tokens tokens; numbered sentences keep chunks distinct."""
+    from tokenization import encode, get_encoding
+    sentences = []
+    # Sentences run about 18 tokens; overshoot, then cut at the exact token count
+    for i in range(target_tokens // 12 + 1):
+        sentences.append(SENTENCES[(i + seed) % len(SENTENCES)].format(n=seed * 100000 + i))
+        if i % 8 == 7:
+            sentences.append("\n")
+    tokens = encode(" ".join(sentences))[:target_tokens]
+    return get_encoding().decode(tokens.tolist())
+
+def wait_for_server(url: str, timeout: float = 20):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Fake OpenAI server did not start at {url}")
+
+async def run_scenario(fake_client, fake_url: str, name: str, request, verbose: bool) -> dict:
+    import llm
+    await fake_client.post(f"{fake_url}/reset")
+    # Each scenario starts cold so cached completions from earlier runs don't hide calls
+    llm.response_cache.entries.clear()
+    gateway_before = llm.gateway.stats()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    # The app logs every step with print; keep the results table readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        start = time.perf_counter()
+        response = await request()
+        wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    fake_stats = (await fake_client.get(f"{fake_url}/stats")).json()
+    gateway_after = llm.gateway.stats()
+    return {
+        "scenario": name,
+        "status": response.status_code,
+        "wall_seconds": round(wall, 3),
+        "llm_calls": sum(count for kind, count in fake_stats["calls"].items() if not kind.startswith("supabase")),
+        "calls": fake_stats["calls"],
+        "prompt_tokens": sum(fake_stats["prompt_tokens"].values()),
+        "completion_tokens": sum(fake_stats["completion_tokens"].values()),
+        "errors_injected": fake_stats["errors_injected"],
+        "retries": gateway_after["retries"] - gateway_before["retries"],
+        "peak_llm_concurrency": fake_stats["peak_in_flight"],
+        # Growth over what was allocated before the request, so the app's import footprint is excluded
+        "peak_memory_mb": round((peak - baseline) / 1024 / 1024, 1),
+    }
+
+async def run_benchmarks(args, fake_url: str) -> list:
+    import httpx
+    import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client, \
+            httpx.AsyncClient(timeout=10) as fake_client:
+
+        for seed, size in enumerate(args.sizes):
+            content = make_document(size, seed)
+            document = {"title": f"Benchmark transcript {size} tokens", "content": content, "type": "transcript"}
+            context = {}
+
+            async def upload():
+                response = await client.post("/api/research/upload", json=document)
+                context["context_id"] = response.json().get("context_id")
+                return response
+
+            async def question():
+                return await client.post("/api/research/question", json={
+                    "question": QUESTION, "context_id": context.get("context_id") or str(uuid.uuid4()),
+                    "document_content": content, "question_id": str(uuid.uuid4()), "mode": args.question_mode,
+                })
+
+            async def report():
+                return await client.post("/api/research/generate-report", json=document)
+
+            for name, request in [("upload", upload), ("question", question), ("report", report)]:
+                if name not in args.scenarios:
+                    continue
+                result = await run_scenario(fake_client, fake_url, name, request, args.verbose)
+                result["document_tokens"] = size
+                results.append(result)
+                print(format_row(result), flush=True)
+    return results
+
+HEADER = f"{'tokens':>8} {'scenario':<9} {'status':>6} {'wall s':>8} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'retries':>7} {'peak MB':>8}"
+
+def format_row(result: dict) -> str:
+    return (f"{result['document_tokens']:>8} {result['scenario']:<9} {result['status']:>6} {result['wall_seconds']:>8.2f} "
+            f"{result['llm_calls']:>6} {result['prompt_tokens']:>11} {result['completion_tokens']:>10} "
+            f"{result['retries']:>7} {result['peak_memory_mb']:>8.1f}")
+
+def find_regressions(results: list, baseline: list) -> list:
+    """Messages for every result that regressed against the baseline result for the same size and scenario."""
+    previous = {(result["document_tokens"], result["scenario"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get((result["document_tokens"], result["scenario"]))
+        if base is None:
+            continue
+        label = f"{result['scenario']} at {result['document_tokens']} tokens"
+        if result["status"] >= 400 > base["status"]:
+            regressions.append(f"{label}: status {result['status']} (baseline {base['status']})")
+        for metric, (relative, absolute) in REGRESSION_LIMITS.items():
+            limit = max(base[metric] * (1 + relative), base[metric] + absolute)
+            if result[metric] > limit:
+                regressions.append(f"{label}: {metric} {result[metric]} > {limit:g} (baseline {base[metric]})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,500000", help="document sizes in tokens")
+    parser.add_argument("--scenarios", default="upload,question,report")
+    parser.add_argument("--question-mode", default=None, help="retrieval, scan or cascade (default: QUESTION_MODE)")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--completion-tokens", type=int, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--baseline", help="compare with this --json file and exit 1 on regressions")
+    parser.add_argument("--verbose", action="store_true", help="show the app's log output")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.scenarios = args.scenarios.split(",")
+
+    port = free_port()
+    fake_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([
+        sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_openai.py"), "--port", str(port),
+        "--latency", str(args.latency), "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens), "--error-rate", str(args.error_rate),
+        "--error-status", str(args.error_status),
+    ])
+    try:
+        wait_for_server(f"{fake_url}/stats")
+        # Must be set before the app (and config) are imported
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_BASE_URL": f"{fake_url}/v1",
+            "SUPABASE_URL": fake_url,
+            "SUPABASE_SERVICE_KEY": "bench.bench.bench",
+        })
+        os.environ.pop("LLM_CACHE_DIR", None)
+        os.environ.setdefault("LLM_DEFAULT_RPM", "1000000")
+        os.environ.setdefault("LLM_DEFAULT_TPM", "1000000000")
+        tracemalloc.start()
+        print(HEADER)
+        results = asyncio.run(run_benchmarks(args, fake_url))
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"settings": {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "verbose")}, "results": results}, f, indent=2)
+    finally:
+        server.terminate()
+        server.wait()
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f)["results"])
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Micro-benchmark: legacy per-stage tokenization vs. encode-once slicing.
+
+Run from the backend directory:
+    python benchmarks/bench_tokenization.py --size-mb 1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokenization import get_encoding, encode, chunk_bounds, decode_chunks, sentence_end_mask
+
+SAMPLE = (
+    "The company reported record data center revenue, driven by demand for accelerated computing. "
+    "Management expects supply to improve through the second half of the year! "
+    "Analysts asked about pricing, margins and the competitive landscape?\n"
+)
+
+def legacy_split(encoding, text, max_tokens):
+    # The original split_text_into_chunks: encode, then append one token at a time
+    tokens = encoding.encode(text)
+    chunks, current_chunk = [], []
+    for token in tokens:
+        if len(current_chunk) >= max_tokens:
+            chunks.append(encoding.decode(current_chunk))
+            current_chunk = []
+        current_chunk.append(token)
+    if current_chunk:
+        chunks.append(encoding.decode(current_chunk))
+    return chunks
+
+def legacy_pipeline(text):
+    """Tokenization work done by the original process_document for one upload."""
+    encoding = get_encoding()
+    # process_text_with_context: count, split into 2000-token chunks and re-join
+    if len(encoding.encode(text)) > 3000:
+        text = "\n==========\n".join(legacy_split(encoding, text, 2000))
+    # process_document: count again and split into 3000-token chunks
+    len(encoding.encode(text))
+    chunks = legacy_split(encoding, text, 3000)
+    # extract_key_points: count and split a third time
+    len(encoding.encode(text))
+    legacy_split(encoding, text, 3000)
+    return chunks
+
+def single_pass_pipeline(text):
+    """Encode once, then slice the token array for every chunk size."""
+    tokens = encode(text)
+    question_chunks = decode_chunks(tokens, chunk_bounds(tokens, 2000, snap_to_sentences=True))
+    analysis_chunks = decode_chunks(tokens, chunk_bounds(tokens, 3000, snap_to_sentences=True))
+    return analysis_chunks, question_chunks
+
+def best_of(function, text, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=1.0, help="input size in megabytes")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    text = SAMPLE * int(args.size_mb * 1024 * 1024 / len(SAMPLE))
+    # Warm the encoder and sentence-boundary table so only steady-state cost is measured
+    sentence_end_mask()
+    encode(SAMPLE)
+
+    legacy = best_of(legacy_pipeline, text, args.repeats)
+    single_pass = best_of(single_pass_pipeline, text, args.repeats)
+    print(f"input: {len(text) / 1024 / 1024:.2f} MB, {len(encode(text))} tokens")
+    print(f"legacy (4 encodes + per-token chunking): {legacy * 1000:8.1f} ms")
+    print(f"single pass (1 encode + array slicing):  {single_pass * 1000:8.1f} ms")
+    print(f"speedup: {legacy / single_pass:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Local stand-in for the OpenAI API (and the Supabase reports table) for offline benchmarks.
+
+Serves /v1/chat/completions (plain, streaming and JSON mode) and /v1/embeddings with a simple
+latency model: each completion takes --latency seconds plus its tokens at --tokens-per-second.
+--error-rate injects 429s (with Retry-After) or 500s. Token counts are approximate (4 characters
+per token) and only meant for comparing runs. GET /stats returns call and token counters.
+
+Run from the backend directory:
+    python benchmarks/fake_openai.py --port 8790 --latency 0.2 --tokens-per-second 100
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 256
+WORDS = ("revenue growth margin guidance demand supply capacity pricing customers inference training "
+         "datacenter outlook quarter segment investment partnership regulation competition").split()
+
+def approximate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def stable_random(text: str) -> random.Random:
+    # Same prompt, same reply, so runs are comparable
+    return random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+
+class FakeOpenAI:
+    def __init__(self, latency: float, tokens_per_second: float, completion_tokens: int,
+                 error_rate: float, error_status: int, relevant_rate: float, seed: int):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.relevant_rate = relevant_rate
+        self.random = random.Random(seed)
+        self.reports: Dict[str, dict] = {}
+        self.reset()
+
+    def reset(self):
+        self.calls: Counter = Counter()
+        self.prompt_tokens: Counter = Counter()
+        self.completion_tokens_used: Counter = Counter()
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "prompt_tokens": dict(self.prompt_tokens),
+            "completion_tokens": dict(self.completion_tokens_used),
+            "errors_injected": self.errors,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+    def injected_error(self):
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            headers = {"retry-after": "0.1"} if self.error_status == 429 else {}
+            return JSONResponse(status_code=self.error_status, headers=headers, content={
+                "error": {"message": "Injected error", "type": "rate_limit_error" if self.error_status == 429 else "server_error"}
+            })
+        return None
+
+    def reply(self, messages: List[Dict[str, str]], json_mode: bool) -> str:
+        prompt = "\n".join(message.get("content") or "" for message in messages)
+        rng = stable_random(prompt)
+        words = [rng.choice(WORDS) for _ in range(self.completion_tokens)]
+        if json_mode:
+            return json.dumps({
+                "summary": "## Main Points\n- " + " ".join(words[: self.completion_tokens // 2]),
+                "key_points": [" ".join(words[i:i + 8]) for i in range(0, 24, 8)],
+                "entities": [{"name": "Example Corp", "type": "Organization"}],
+            })
+        if "NO_RELEVANT_INFO" in messages[0].get("content", "") and rng.random() >= self.relevant_rate:
+            return "NO_RELEVANT_INFO"
+        return " ".join(words)
+
+    async def track(self, kind: str, model: str, prompt_tokens: int):
+        self.calls[f"{kind}:{model}"] += 1
+        self.prompt_tokens[model] += prompt_tokens
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+
+    def done(self, model: str, completion_tokens: int):
+        self.in_flight -= 1
+        self.completion_tokens_used[model] += completion_tokens
+
+def create_app(fake: FakeOpenAI) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = fake.injected_error()
+        if error is not None:
+            return error
+        model = body["model"]
+        messages = body["messages"]
+        prompt_tokens = sum(approximate_tokens(message.get("content") or "") for message in messages)
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = fake.reply(messages, json_mode)
+        completion_tokens = approximate_tokens(content)
+        await fake.track("chat", model, prompt_tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(completion_tokens / fake.tokens_per_second)
+            fake.done(model, completion_tokens)
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        async def stream():
+            try:
+                pieces = re.findall(r"\S+\s*", content) or [content]
+                delay = completion_tokens / fake.tokens_per_second / len(pieces)
+                for piece in pieces:
+                    await asyncio.sleep(delay)
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+            finally:
+                fake.done(model, completion_tokens)
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        error = fake.injected_error()
+        if error is not None:
+            return error
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        prompt_tokens = sum(approximate_tokens(text) for text in inputs)
+        await fake.track("embeddings", body["model"], prompt_tokens)
+        data = []
+        for index, text in enumerate(inputs):
+            # Hashed bag of words, so texts sharing words get similar vectors
+            vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+            for word in re.findall(r"\w+", text.lower()):
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % EMBEDDING_DIMENSIONS] += 1
+            if body.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        fake.done(body["model"], 0)
+        return {"object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens}}
+
+    # Minimal PostgREST endpoints for the reports table, so saving reports stays offline too
+    @app.post("/rest/v1/reports")
+    async def insert_reports(request: Request):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        for row in rows:
+            fake.reports[row["id"]] = row
+        fake.calls["supabase:insert"] += 1
+        return JSONResponse(status_code=201, content=rows)
+
+    @app.get("/rest/v1/reports")
+    async def select_reports(request: Request):
+        report_id = request.query_params.get("id", "").removeprefix("eq.")
+        fake.calls["supabase:select"] += 1
+        return [fake.reports[report_id]] if report_id in fake.reports else []
+
+    @app.get("/stats")
+    async def stats():
+        return fake.stats()
+
+    @app.post("/reset")
+    async def reset():
+        fake.reset()
+        return {"status": "ok"}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="completion generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="approximate words per completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=429, choices=[429, 500, 503])
+    parser.add_argument("--relevant-rate", type=float, default=0.2, help="fraction of chunk scans that find something")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    fake = FakeOpenAI(args.latency, args.tokens_per_second, args.completion_tokens,
+                      args.error_rate, args.error_status, args.relevant_rate, args.seed)
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
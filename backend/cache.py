@@ -0,0 +1,129 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from state import StateBackend
+
+def cache_key(model: str, messages: List[Dict[str, str]], temperature: float, **options: Any) -> str:
+    """Content-addressed key for an LLM request: hash of model, prompt, text, temperature and options."""
+    payload = json.dumps([model, temperature, messages, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Two-tier cache: a bounded in-memory LRU in front of an optional SQLite store.
+
+    The second tier is either a SQLite file in cache_dir or, failing that, a shared state
+    backend, so worker processes reuse each other's completions. SQLite writes are handed to a
+    writer thread that commits them in batches, keeping the commit off the event loop; a
+    response is in the memory tier from the moment it's set.
+    """
+
+    def __init__(self, max_entries: int = 2048, cache_dir: Optional[str] = None,
+                 shared: Optional[StateBackend] = None, shared_ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.shared = None if cache_dir else shared
+        self.shared_ttl_seconds = shared_ttl_seconds
+        self.entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        self.writes: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self.write_batches = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, "llm_cache.sqlite3")
+            # WAL so lookups don't wait for the writer's commits
+            self.db = sqlite3.connect(path, timeout=0.25, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.db.commit()
+            self.writer = threading.Thread(target=self._write_loop, args=(path,), name="llm-cache-writer", daemon=True)
+            self.writer.start()
+            atexit.register(self.close)
+
+    def get(self, key: str) -> Optional[Any]:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return self.entries[key]
+        if self.db is not None:
+            try:
+                row = self.db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.OperationalError as e:
+                print(f"LLM cache lookup failed: {e}")
+                row = None
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+                self.disk_hits += 1
+                return value
+        if self.shared is not None:
+            value = self.shared.get("llm", key)
+            if value is not None:
+                self._remember(key, value)
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        self._remember(key, value)
+        if self.db is not None:
+            self.writes.put((key, json.dumps(value)))
+        if self.shared is not None:
+            self.shared.set("llm", key, value, self.shared_ttl_seconds)
+
+    def _write_loop(self, path: str):
+        db = sqlite3.connect(path, timeout=5)
+        while True:
+            rows = [self.writes.get()]
+            while len(rows) < 256:
+                try:
+                    rows.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            try:
+                db.executemany("INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", rows)
+                db.commit()
+                self.write_batches += 1
+            except sqlite3.Error as e:
+                print(f"LLM cache write of {len(rows)} responses failed: {e}")
+                db.rollback()
+            if stop:
+                db.close()
+                return
+
+    def close(self):
+        """Commit queued writes and stop the writer thread."""
+        if self.db is not None and self.writer.is_alive():
+            self.writes.put(None)
+            self.writer.join(timeout=5)
+
+    def _remember(self, key: str, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "persistent": self.db is not None or self.shared is not None,
+            "queued_writes": self.writes.qsize(),
+            "write_batches": self.write_batches,
+        }
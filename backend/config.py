@@ -3,6 +3,152 @@ import os
 
 load_dotenv()
 
+# Checked when the OpenAI client is first built and reported by /readyz, so a missing key
+# doesn't stop the process from starting and answering health checks
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY environment variable is not set") 
\ No newline at end of file
+
+# Supabase project used to store generated reports
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+# Maximum number of OpenAI requests in flight at once across all endpoints
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+# How long finished jobs keep their progress available to late subscribers
+PROGRESS_TTL_SECONDS = float(os.getenv("PROGRESS_TTL_SECONDS", "300"))
+# How long a progress stream waits for a job_id that hasn't been started before reporting it unknown
+PROGRESS_START_TIMEOUT_SECONDS = float(os.getenv("PROGRESS_START_TIMEOUT_SECONDS", "30"))
+
+# LLM response cache: in-memory LRU size and optional directory for a persistent SQLite tier
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")
+
+# Question answering: "retrieval" embeds chunks and sends only the best matches to the
+# final answer call, "scan" asks the model to check every chunk, "cascade" filters chunks
+# through CASCADE_TIERS before the answer model sees them
+QUESTION_MODE = os.getenv("QUESTION_MODE", "retrieval")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# Input tokens per embeddings request; the API rejects requests over 300k tokens
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "250000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "6000"))
+
+# Cascade tiers in order: "lexical" keeps the best BM25 matches, "screen" asks SCREEN_MODEL
+# whether each remaining chunk is relevant
+CASCADE_TIERS = [tier.strip() for tier in os.getenv("CASCADE_TIERS", "lexical,screen").split(",") if tier.strip()]
+CASCADE_LEXICAL_TOP_K = int(os.getenv("CASCADE_LEXICAL_TOP_K", "8"))
+
+# Server-side document store limits for context_id lookups
+DOCUMENT_STORE_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_STORE_MAX_DOCUMENTS", "64"))
+DOCUMENT_STORE_MAX_TOKENS = int(os.getenv("DOCUMENT_STORE_MAX_TOKENS", "5000000"))
+
+# Chunk sizes in tokens for analysis and question answering, plus overlap and sentence snapping
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "3000"))
+QUESTION_CHUNK_TOKENS = int(os.getenv("QUESTION_CHUNK_TOKENS", "2000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+CHUNK_SNAP_TO_SENTENCES = os.getenv("CHUNK_SNAP_TO_SENTENCES", "true").lower() == "true"
+
+# Cut analysis chunks and summary reduction batches where the content says to instead of at fixed
+# offsets, so an edit or an append only changes the chunks and batches around it. Only applies to
+# documents with a document_id, since the cuts make chunks smaller and only pay off on a resubmission
+CONTENT_DEFINED_BOUNDARIES = os.getenv("CONTENT_DEFINED_BOUNDARIES", "true").lower() == "true"
+
+# Per-document results kept for incremental re-analysis of resubmitted documents (by document_id)
+ANALYSIS_MEMO_MAX_DOCUMENTS = int(os.getenv("ANALYSIS_MEMO_MAX_DOCUMENTS", "256"))
+ANALYSIS_MEMO_MAX_BYTES = int(os.getenv("ANALYSIS_MEMO_MAX_BYTES", str(64 * 1024 * 1024)))
+ANALYSIS_MEMO_TTL_SECONDS = float(os.getenv("ANALYSIS_MEMO_TTL_SECONDS", "86400"))
+
+# Streamed file uploads: chunks waiting for (or in) analysis before reading more of the body pauses
+STREAM_UPLOAD_MAX_PENDING_CHUNKS = int(os.getenv("STREAM_UPLOAD_MAX_PENDING_CHUNKS", "16"))
+
+# Chunk extraction: "structured" makes one JSON-mode call per chunk for summary, key points and
+# entities; "separate" makes individual calls per stage. Structured calls go to EXTRACTION_MODEL
+# instead of the per-stage models below; it defaults to gpt-4-turbo because gpt-4 doesn't accept
+# JSON mode. Set EXTRACTION_MODE=separate to keep uploads on the per-stage models.
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "structured")
+EXTRACTION_MODEL = os.getenv("EXTRACTION_MODEL", "gpt-4-turbo")
+
+# Models per stage: summaries and reduce calls, key point and entity extraction, reports,
+# exhaustive chunk scans, cascade screening and final answers
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4")
+KEY_POINTS_MODEL = os.getenv("KEY_POINTS_MODEL", "gpt-3.5-turbo")
+ENTITY_MODEL = os.getenv("ENTITY_MODEL", "gpt-3.5-turbo")
+REPORT_MODEL = os.getenv("REPORT_MODEL", "gpt-4")
+SCAN_MODEL = os.getenv("SCAN_MODEL", "gpt-4")
+SCREEN_MODEL = os.getenv("SCREEN_MODEL", "gpt-3.5-turbo")
+ANSWER_MODEL = os.getenv("ANSWER_MODEL", "gpt-4")
+
+# Hierarchical summary reduction: max input tokens and summaries per reduce call
+REDUCE_TOKEN_BUDGET = int(os.getenv("REDUCE_TOKEN_BUDGET", "6000"))
+REDUCE_MAX_FAN_IN = int(os.getenv("REDUCE_MAX_FAN_IN", "8"))
+
+# Background job queue for uploads and reports: worker pool size, max waiting jobs, result retention
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "16"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "30"))
+
+# Answer store for polling clients: max answers, approximate byte cap and retention
+ANSWER_STORE_MAX_ENTRIES = int(os.getenv("ANSWER_STORE_MAX_ENTRIES", "1024"))
+ANSWER_STORE_MAX_BYTES = int(os.getenv("ANSWER_STORE_MAX_BYTES", str(8 * 1024 * 1024)))
+ANSWER_TTL_SECONDS = float(os.getenv("ANSWER_TTL_SECONDS", "600"))
+
+# LLM gateway: default per-model request/token budgets per minute, optional per-model overrides
+# as JSON (e.g. {"gpt-4": {"rpm": 500, "tpm": 10000}}), retry count and completion size estimate
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "500"))
+LLM_DEFAULT_TPM = float(os.getenv("LLM_DEFAULT_TPM", "80000"))
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS")
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "500"))
+
+# Financial metrics: seconds before a cached quote is refreshed in the background, and the
+# thread pool size for concurrent yfinance lookups
+FINANCIAL_METRICS_TTL_SECONDS = float(os.getenv("FINANCIAL_METRICS_TTL_SECONDS", "300"))
+MARKET_FETCH_WORKERS = int(os.getenv("MARKET_FETCH_WORKERS", "8"))
+
+# Samples kept per symbol in the in-memory price history (three float64 arrays each)
+TIMESERIES_CAPACITY = int(os.getenv("TIMESERIES_CAPACITY", "2880"))
+
+# Watchlist: a file (JSON list, or lines of SYMBOL,Name,group) or a comma-separated symbol list
+# such as "NVDA=NVIDIA,AMD". The scheduler refreshes up to WATCHLIST_BATCH_SIZE of the most overdue
+# symbols every WATCHLIST_BATCH_INTERVAL_SECONDS; symbols requested within the viewed window are
+# refreshed every WATCHLIST_HOT_TTL_SECONDS instead of FINANCIAL_METRICS_TTL_SECONDS
+WATCHLIST_FILE = os.getenv("WATCHLIST_FILE")
+WATCHLIST = os.getenv("WATCHLIST")
+WATCHLIST_BATCH_SIZE = int(os.getenv("WATCHLIST_BATCH_SIZE", "25"))
+WATCHLIST_BATCH_INTERVAL_SECONDS = float(os.getenv("WATCHLIST_BATCH_INTERVAL_SECONDS", "2"))
+WATCHLIST_HOT_TTL_SECONDS = float(os.getenv("WATCHLIST_HOT_TTL_SECONDS", "60"))
+WATCHLIST_VIEWED_WINDOW_SECONDS = float(os.getenv("WATCHLIST_VIEWED_WINDOW_SECONDS", "900"))
+
+# HTTP caching of market data: how long browsers and CDNs may reuse a response, and how much
+# longer they may serve it while revalidating in the background
+HTTP_CACHE_MAX_AGE_SECONDS = int(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", "60"))
+HTTP_CACHE_STALE_SECONDS = int(os.getenv("HTTP_CACHE_STALE_SECONDS", "300"))
+
+# Batch report generation: max documents per request, documents analyzed at once (LLM calls are
+# still bounded by the gateway) and how many finished reports to buffer before a bulk insert
+REPORT_BATCH_MAX_DOCUMENTS = int(os.getenv("REPORT_BATCH_MAX_DOCUMENTS", "50"))
+REPORT_BATCH_CONCURRENCY = int(os.getenv("REPORT_BATCH_CONCURRENCY", "4"))
+REPORT_INSERT_BATCH_SIZE = int(os.getenv("REPORT_INSERT_BATCH_SIZE", "10"))
+
+# Instrumentation: request header that opts a request into tracing (Server-Timing and X-Trace-Id
+# in the response), how many recent traces to keep, and the event loop lag sampling interval
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Trace")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+# Startup warm-up: load the tokenizer and build the OpenAI and Supabase clients in the background
+# after the server starts listening, retrying failures every WARMUP_RETRY_SECONDS
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+
+# Where job progress, answers, job results, LLM responses and market quotes live between requests:
+# "memory" (one process) or "sqlite", a WAL-mode file at STATE_SQLITE_PATH that every worker
+# process and instance on the host share, e.g. for `uvicorn --workers 4`. Progress events are
+# polled from it every STATE_POLL_INTERVAL_SECONDS; cached LLM responses there expire after
+# STATE_LLM_CACHE_TTL_SECONDS.
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "inference-state.sqlite3")
+STATE_POLL_INTERVAL_SECONDS = float(os.getenv("STATE_POLL_INTERVAL_SECONDS", "0.05"))
+STATE_LLM_CACHE_TTL_SECONDS = float(os.getenv("STATE_LLM_CACHE_TTL_SECONDS", "86400"))
@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import QUESTION_CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_SNAP_TO_SENTENCES
+from tokenization import encode, chunk_bounds, decode_chunks, ChunkTexts
+from retrieval import LexicalIndex
+from metrics import span
+
+class StoredDocument:
+    """A document tokenized once, with chunks and derived data kept for follow-up questions."""
+
+    def __init__(self, context_id: str, title: str, content: str, chunk_tokens: int = QUESTION_CHUNK_TOKENS,
+                 tokens: Optional[np.ndarray] = None, content_hash: Optional[str] = None):
+        """Pass tokens and content_hash (with empty content) for a document tokenized while it streamed in."""
+        self.context_id = context_id
+        self.title = title
+        self.content_hash = content_hash or hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if tokens is None:
+            with span("tokenize"):
+                tokens = encode(content)
+        self.tokens = tokens
+        self.chunk_spans: Dict[Tuple[int, bool], List[Tuple[int, int]]] = {}
+        # Question chunks, decoded when read; chunk i spans tokens[chunk_bounds[i][0]:chunk_bounds[i][1]]
+        self.chunk_bounds = self.spans(chunk_tokens)
+        self.chunks = ChunkTexts(self.tokens, self.chunk_bounds)
+        self.chunk_token_counts = [end - start for start, end in self.chunk_bounds]
+        self.embeddings: Optional[np.ndarray] = None  # Filled in by the first retrieval question
+        self.embeddings_task: Optional[asyncio.Task] = None  # That question's embedding run, shared with concurrent ones
+        self.lexical_index: Optional[LexicalIndex] = None  # Filled in by the first cascade question
+        self.last_access = time.monotonic()
+
+    @property
+    def token_count(self) -> int:
+        return len(self.tokens)
+
+    def spans(self, max_tokens: int, content_defined: bool = False) -> List[Tuple[int, int]]:
+        """Chunk spans at the given size over the stored token array, memoized."""
+        key = (max_tokens, content_defined)
+        if key not in self.chunk_spans:
+            with span("chunk"):
+                self.chunk_spans[key] = chunk_bounds(self.tokens, max_tokens, overlap=CHUNK_OVERLAP_TOKENS,
+                                                     snap_to_sentences=CHUNK_SNAP_TO_SENTENCES, content_defined=content_defined)
+        return self.chunk_spans[key]
+
+    def split(self, max_tokens: int, content_defined: bool = False) -> List[str]:
+        """Chunk texts at the given size, decoded from the stored token array (only the spans are kept)."""
+        return decode_chunks(self.tokens, self.spans(max_tokens, content_defined))
+
+class DocumentStore:
+    """LRU store of documents keyed by context_id, bounded by document count and total tokens."""
+
+    def __init__(self, max_documents: int = 64, max_tokens: int = 5_000_000):
+        self.max_documents = max_documents
+        self.max_tokens = max_tokens
+        self.documents: "OrderedDict[str, StoredDocument]" = OrderedDict()
+        self.total_tokens = 0
+
+    def register(self, context_id: str, title: str, content: str) -> StoredDocument:
+        return self.add(StoredDocument(context_id, title, content))
+
+    def add(self, document: StoredDocument) -> StoredDocument:
+        """Store an already built document, e.g. one tokenized in a worker thread."""
+        self.remove(document.context_id)
+        self.documents[document.context_id] = document
+        self.total_tokens += document.token_count
+        self._evict()
+        return document
+
+    def get(self, context_id: str) -> Optional[StoredDocument]:
+        document = self.documents.get(context_id)
+        if document is not None:
+            self.documents.move_to_end(context_id)
+            document.last_access = time.monotonic()
+        return document
+
+    def get_or_register(self, context_id: str, title: str, content: str) -> StoredDocument:
+        """The stored document for context_id if it has this content, otherwise the one for the content itself.
+
+        Content that doesn't match is registered under "content:<hash>" rather than the client's
+        context_id, so clients sending a shared placeholder id (the frontend's "current") can't
+        overwrite each other's documents, and identical content is chunked and embedded once.
+        """
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        document = self.get(context_id)
+        if document is not None and document.content_hash == content_hash:
+            return document
+        content_id = f"content:{content_hash}"
+        return self.get(content_id) or self.register(content_id, title, content)
+
+    def remove(self, context_id: str):
+        document = self.documents.pop(context_id, None)
+        if document is not None:
+            self.total_tokens -= document.token_count
+
+    def _evict(self):
+        # Always keep the most recent document, even if it alone exceeds the token cap
+        while len(self.documents) > 1 and (len(self.documents) > self.max_documents or self.total_tokens > self.max_tokens):
+            _, document = self.documents.popitem(last=False)
+            self.total_tokens -= document.token_count
+            print(f"Evicted document {document.context_id} from the document store")
@@ -0,0 +1,178 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from metrics import llm_request_seconds, llm_requests, trace_span, trace_count
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to one minute's worth; acquire waits for capacity."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.available = rate_per_minute
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount: float) -> float:
+        """Take `amount` units, waiting until they are available. Returns seconds waited."""
+        # Requests larger than the bucket only need a full bucket, otherwise they would never run
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # The lock keeps waiters first-come first-served
+        async with self.lock:
+            self._refill()
+            while self.available < amount:
+                delay = (amount - self.available) / self.rate_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.available -= amount
+        return waited
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on throttling and grows back by one after a run of successes."""
+
+    def __init__(self, maximum: int, minimum: int = 1, increase_after: int = 10):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = maximum
+        self.increase_after = increase_after
+        self.in_use = 0
+        self.successes = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_use -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        self.successes += 1
+        if self.successes >= self.increase_after and self.limit < self.maximum:
+            self.limit += 1
+            self.successes = 0
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self.successes = 0
+
+def retry_delay(error: Exception, attempt: int, base_delay: float, max_delay: float) -> float:
+    """Honour Retry-After when the API sends it, otherwise exponential backoff with full jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(max_delay, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def is_retryable(error: Exception) -> bool:
+    import openai  # Already loaded by the client whose request failed
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def is_rate_limited(error: Exception) -> bool:
+    import openai
+    return isinstance(error, openai.RateLimitError)
+
+class LLMGateway:
+    """Single path for OpenAI requests: per-model RPM/TPM buckets, retries and adaptive concurrency."""
+
+    def __init__(self, concurrency: int, default_rpm: float, default_tpm: float,
+                 model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.limiter = AdaptiveLimiter(concurrency)
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self.queued = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_limit_wait_seconds = 0.0
+
+    def _buckets(self, model: str) -> Dict[str, TokenBucket]:
+        if model not in self.buckets:
+            limits = self.model_limits.get(model, {})
+            self.buckets[model] = {
+                "rpm": TokenBucket(limits.get("rpm", self.default_rpm)),
+                "tpm": TokenBucket(limits.get("tpm", self.default_tpm)),
+            }
+        return self.buckets[model]
+
+    async def call(self, model: str, estimated_tokens: int, request: Callable[[], Awaitable[Any]]) -> Any:
+        """Run request() once the model's budgets allow it, retrying throttled and transient failures."""
+        buckets = self._buckets(model)
+        attempt = 0
+        while True:
+            self.queued += 1
+            try:
+                await self.limiter.acquire()
+            finally:
+                self.queued -= 1
+            try:
+                self.rate_limit_wait_seconds += await buckets["rpm"].acquire(1)
+                self.rate_limit_wait_seconds += await buckets["tpm"].acquire(estimated_tokens)
+                self.in_flight += 1
+                self.requests += 1
+                started = time.perf_counter()
+                try:
+                    response = await request()
+                finally:
+                    self.in_flight -= 1
+                    elapsed = time.perf_counter() - started
+                    llm_request_seconds.observe(elapsed, model=model)
+                    trace_span(f"llm.{model}", elapsed)
+                self.limiter.on_success()
+                llm_requests.inc(model=model, outcome="ok")
+                return response
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.throttled += 1
+                    self.limiter.on_throttle()
+                    llm_requests.inc(model=model, outcome="throttled")
+                    trace_count("llm.throttled")
+                else:
+                    llm_requests.inc(model=model, outcome="error")
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = retry_delay(e, attempt, self.base_delay, self.max_delay)
+                print(f"{model} request failed ({e.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            finally:
+                await self.limiter.release()
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "concurrency_limit": self.limiter.limit,
+            "max_concurrency": self.limiter.maximum,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rate_limit_wait_seconds": round(self.rate_limit_wait_seconds, 3),
+        }
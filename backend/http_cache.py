@@ -0,0 +1,62 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the values that determine a response, so it can be computed without building the body."""
+    return '"' + hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+def http_date(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent (RFC 9110 precedence)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        # GET uses weak comparison, so W/"x" matches "x"
+        return "*" in candidates or etag in [candidate.removeprefix("W/") for candidate in candidates]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.astimezone()
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def cached_json_response(request: Request, etag: str, last_modified: Optional[datetime], cache_control: str,
+                         build: Callable[[], Any]) -> Response:
+    """304 when the client's copy is current, otherwise the JSON from build(). Both carry the cache headers."""
+    headers: Dict[str, str] = {"Cache-Control": cache_control, "ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(build()), headers=headers)
+
+class StaticJSON:
+    """A response body serialized once, with its ETag, for data that only changes on deploy."""
+
+    def __init__(self, payload: Any, cache_control: str):
+        self.body = JSONResponse(jsonable_encoder(payload)).body
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.last_modified = datetime.now(timezone.utc)
+        self.cache_control = cache_control
+
+    def respond(self, request: Request) -> Response:
+        headers = {"Cache-Control": self.cache_control, "ETag": self.etag, "Last-Modified": http_date(self.last_modified)}
+        if is_not_modified(request, self.etag, self.last_modified):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from state import StateBackend
+
+class AnalysisMemo:
+    """LLM responses from one document's previous analysis, keyed like the response cache.
+
+    A rerun asks the memo before every chunk analysis and reduce call, so only chunks and
+    reduction branches whose input changed since the last revision cost an LLM call. Unlike
+    the shared response cache it can't be evicted by other traffic, and entries the rerun
+    doesn't touch are dropped when it's saved, so the memo tracks the current revision only.
+    Identical calls made concurrently (repeated chunks) share one computation.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Any]] = None):
+        self.previous = entries or {}
+        self.current: Dict[str, Any] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.reused = 0
+        self.computed = 0
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self.current:
+            return self.current[key]
+        if key in self.previous:
+            self.reused += 1
+            self.current[key] = self.previous[key]
+            return self.current[key]
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+            self.computed += 1
+        # Every waiter belongs to the same pipeline run, which is cancelled as a whole
+        value = await task
+        self.current[key] = value
+        return value
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held by this revision's entries."""
+        return sum(len(key) + len(str(value)) for key, value in self.current.items())
+
+class AnalysisMemoStore:
+    """AnalysisMemo entries by client-chosen document_id, LRU bounded by count, approximate bytes and TTL.
+
+    With a shared state backend entries are written through to it, so a resubmission landing
+    on another worker process still only pays for its delta.
+    """
+
+    def __init__(self, max_documents: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 86400,
+                 shared: Optional[StateBackend] = None):
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.documents: "OrderedDict[str, Tuple[Dict[str, Any], float, int]]" = OrderedDict()  # document_id -> (entries, saved_at, size)
+        self.total_bytes = 0
+        self.reused = 0
+        self.computed = 0
+
+    def load(self, document_id: str) -> AnalysisMemo:
+        entry = self.documents.get(document_id)
+        if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+            self.drop(document_id)
+            entry = None
+        if entry is not None:
+            self.documents.move_to_end(document_id)
+            return AnalysisMemo(entry[0])
+        entries = self.shared.get("analysis_memo", document_id) if self.shared is not None else None
+        return AnalysisMemo(entries)
+
+    def save(self, document_id: str, memo: AnalysisMemo):
+        self.reused += memo.reused
+        self.computed += memo.computed
+        self.drop(document_id)
+        size = memo.size
+        self.documents[document_id] = (memo.current, time.monotonic(), size)
+        self.total_bytes += size
+        # Always keep the document just saved, even if it alone exceeds the byte cap
+        while len(self.documents) > 1 and (len(self.documents) > self.max_documents or self.total_bytes > self.max_bytes):
+            self.drop(next(iter(self.documents)))
+        if self.shared is not None:
+            self.shared.set("analysis_memo", document_id, memo.current, self.ttl_seconds)
+
+    def drop(self, document_id: str):
+        entry = self.documents.pop(document_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.documents),
+            "entries": sum(len(entries) for entries, _, _ in self.documents.values()),
+            "bytes": self.total_bytes,
+            "reused": self.reused,
+            "computed": self.computed,
+        }
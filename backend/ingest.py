@@ -0,0 +1,153 @@
+import codecs
+import hashlib
+from typing import AsyncIterator, Dict, List, Optional
+import numpy as np
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from tokenization import StreamingEncoder, StreamingChunker, TokenBuffer, get_encoding
+
+MAX_FIELD_BYTES = 64 * 1024
+
+class MultipartUpload:
+    """Runs a multipart/form-data body through python-multipart's streaming parser.
+
+    The file part's bytes are handed back as they arrive; the other parts are small text
+    fields (title, type, ...) collected into `fields`. Only one file part is accepted.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.file_blocks: List[bytes] = []
+        self.file_seen = False
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.part_name = ""
+        self.part_is_file = False
+        self.field_value = bytearray()
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+        })
+
+    def write(self, data: bytes) -> List[bytes]:
+        """Parse the next piece of the body and return the file bytes it contained."""
+        self.parser.write(data)
+        blocks, self.file_blocks = self.file_blocks, []
+        return blocks
+
+    def finish(self):
+        self.parser.finalize()
+
+    def on_part_begin(self):
+        self.part_name, self.part_is_file = "", False
+        self.field_value = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field.extend(data[start:end])
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value.extend(data[start:end])
+
+    def on_header_end(self):
+        if bytes(self.header_field).lower() == b"content-disposition":
+            _, options = parse_options_header(bytes(self.header_value))
+            self.part_name = options.get(b"name", b"").decode("utf-8", "replace")
+            if b"filename" in options:
+                if self.file_seen:
+                    raise HTTPException(status_code=400, detail="Upload one file per request")
+                self.part_is_file = self.file_seen = True
+                self.filename = options[b"filename"].decode("utf-8", "replace")
+        self.header_field, self.header_value = bytearray(), bytearray()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.part_is_file:
+            self.file_blocks.append(data[start:end])
+            return
+        self.field_value.extend(data[start:end])
+        if len(self.field_value) > MAX_FIELD_BYTES:
+            raise HTTPException(status_code=400, detail=f"Form field {self.part_name} is too large")
+
+    def on_part_end(self):
+        if not self.part_is_file and self.part_name:
+            self.fields[self.part_name] = self.field_value.decode("utf-8", "replace")
+
+async def upload_blocks(request: Request, fields: Dict[str, Optional[str]]) -> AsyncIterator[bytes]:
+    """The uploaded document's bytes as they arrive, from a multipart file part or a raw body.
+
+    Multipart text fields are written into `fields` (overriding query parameters), and the
+    file's name becomes the "filename" field.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        async for block in request.stream():
+            if block:
+                yield block
+        return
+    if not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
+    upload = MultipartUpload(options[b"boundary"])
+    async for data in request.stream():
+        for block in upload.write(data):
+            yield block
+    upload.finish()
+    if not upload.file_seen:
+        raise HTTPException(status_code=400, detail="No file part in the upload")
+    fields.update(upload.fields)
+    fields["filename"] = upload.filename
+
+class StreamingDocument:
+    """A document decoded, hashed, tokenized and chunked block by block as its bytes arrive.
+
+    feed() returns the analysis chunks completed so far, and only the chunk being filled is
+    held. With keep_tokens the token array is also kept (compact int32, grown in place) so
+    the document can be registered for follow-up questions; the text is never held in full.
+    """
+
+    def __init__(self, chunk_tokens: int, overlap: int = 0, snap_to_sentences: bool = False, content_defined: bool = False,
+                 keep_tokens: bool = False):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.hash = hashlib.sha256()
+        self.encoder = StreamingEncoder()
+        self.chunker = StreamingChunker(chunk_tokens, overlap=overlap, snap_to_sentences=snap_to_sentences,
+                                        content_defined=content_defined)
+        self.token_buffer = TokenBuffer() if keep_tokens else None
+        self.token_count = 0
+        self.byte_count = 0
+
+    def feed(self, data: bytes) -> List[str]:
+        self.byte_count += len(data)
+        return self._add(self.encoder.feed(self._decode(data)))
+
+    def finish(self) -> List[str]:
+        chunks = self._add(self.encoder.feed(self._decode(b"", final=True)))
+        return chunks + self._add(self.encoder.finish(), final=True)
+
+    @property
+    def content_hash(self) -> str:
+        return self.hash.hexdigest()
+
+    def tokens(self) -> np.ndarray:
+        """The whole document's tokens, once finished; only available with keep_tokens."""
+        return self.token_buffer.finish()
+
+    def _decode(self, data: bytes, final: bool = False) -> str:
+        text = self.decoder.decode(data, final)
+        # Same hash as StoredDocument computes from the whole content
+        self.hash.update(text.encode("utf-8"))
+        return text
+
+    def _add(self, tokens: np.ndarray, final: bool = False) -> List[str]:
+        if len(tokens):
+            if self.token_buffer is not None:
+                self.token_buffer.append(tokens)
+            self.token_count += len(tokens)
+        chunks = self.chunker.feed(tokens) if len(tokens) else []
+        if final:
+            chunks += self.chunker.finish()
+        encoding = get_encoding()
+        return [encoding.decode(chunk.tolist()) for chunk in chunks]
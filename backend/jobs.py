@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from state import StateBackend
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its configured depth."""
+
+class JobExistsError(Exception):
+    """Raised when a job is submitted with the ID of a job that is still held."""
+
+class Job:
+    def __init__(self, job_id: str, kind: str, run: Callable[[str], Awaitable[Any]]):
+        self.job_id = job_id
+        self.kind = kind
+        self.run = run
+        self.status = "queued"  # queued, running, complete or error
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobQueue:
+    """Bounded queue of heavy jobs drained by a fixed pool of asyncio workers.
+
+    Submitting to a full queue raises QueueFullError instead of waiting, so callers can apply
+    backpressure. Finished jobs are kept for ttl_seconds so clients can collect the result.
+    Jobs run in the process they were submitted to; with a shared state backend their status
+    and result are also published there, so any worker process can answer a status poll.
+    """
+
+    def __init__(self, workers: int = 2, max_depth: int = 16, ttl_seconds: float = 3600,
+                 shared: Optional[StateBackend] = None):
+        self.worker_count = workers
+        self.max_depth = max_depth
+        self.ttl_seconds = ttl_seconds
+        self.jobs: Dict[str, Job] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.shared = shared
+
+    def submit(self, kind: str, run: Callable[[str], Awaitable[Any]], job_id: Optional[str] = None) -> Job:
+        """Queue run(job_id) and return the job immediately.
+
+        A client-chosen job_id must not belong to a job still held here or in the shared state,
+        so one client can't replace another's job or its result.
+        """
+        self._ensure_workers()
+        self.evict_expired()
+        if job_id is not None and self.lookup(job_id) is not None:
+            raise JobExistsError(f"Job {job_id} already exists")
+        job = Job(job_id or str(uuid.uuid4()), kind, run)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_depth} jobs waiting)")
+        self.jobs[job.job_id] = job
+        self.publish(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.evict_expired()
+        return self.jobs.get(job_id)
+
+    def lookup(self, job_id: str) -> Optional[dict]:
+        """A job's status and result, whichever worker process it runs in."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.shared.get("jobs", job_id) if self.shared is not None else None
+
+    def publish(self, job: Job):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set("jobs", job.job_id, job.to_dict(), self.ttl_seconds)
+        except Exception as e:
+            # Best effort: the submitting process still has the job
+            print(f"Failed to publish job {job.job_id}: {e}")
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def evict_expired(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _ensure_workers(self):
+        # Workers start lazily so the queue binds to the running event loop
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_depth)
+            # Workers get a fresh context rather than inheriting per-request state, like a trace,
+            # from whichever request happened to start them
+            self.workers = [asyncio.create_task(self._worker(), context=contextvars.Context()) for _ in range(self.worker_count)]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            self.publish(job)
+            try:
+                job.result = await job.run(job.job_id)
+                job.status = "complete"
+            except Exception as e:
+                print(f"Job {job.job_id} ({job.kind}) failed: {e}")
+                job.error = str(e)
+                job.status = "error"
+            finally:
+                job.finished_at = time.time()
+                job.run = None  # Drop the closure (and the document it holds) once finished
+                self.publish(job)
+                self.queue.task_done()
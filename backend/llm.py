@@ -0,0 +1,146 @@
+import asyncio
+import json
+from typing import AsyncIterator, List, Dict, Optional
+import numpy as np
+from config import (
+    OPENAI_API_KEY, LLM_CONCURRENCY, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS, LLM_CACHE_SIZE, LLM_CACHE_DIR,
+    LLM_DEFAULT_RPM, LLM_DEFAULT_TPM, LLM_RATE_LIMITS, LLM_MAX_RETRIES, LLM_COMPLETION_TOKEN_ESTIMATE,
+    STATE_LLM_CACHE_TTL_SECONDS,
+)
+from cache import ResponseCache, cache_key
+from gateway import LLMGateway
+from tokenization import count_tokens
+from metrics import llm_tokens, trace_count
+from startup import LazyResource
+from state import state_backend
+
+def create_async_client():
+    # Imported here: the openai package takes most of a second to import on a small instance
+    from openai import AsyncOpenAI
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY environment variable is not set")
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+# Async OpenAI client so LLM calls never block the event loop. Retries are left to the gateway.
+# Built on first use or by the startup warm-up, whichever comes first.
+async_client = LazyResource("openai", create_async_client)
+
+# Every OpenAI request goes through the gateway for RPM/TPM budgets, retries and adaptive concurrency
+gateway = LLMGateway(
+    concurrency=LLM_CONCURRENCY,
+    default_rpm=LLM_DEFAULT_RPM,
+    default_tpm=LLM_DEFAULT_TPM,
+    model_limits=json.loads(LLM_RATE_LIMITS) if LLM_RATE_LIMITS else None,
+    max_retries=LLM_MAX_RETRIES,
+)
+
+# Completions keyed by model, prompt, text and temperature. Chunk-level calls are cached
+# individually, so documents sharing most chunks only pay for the new ones.
+response_cache = ResponseCache(
+    max_entries=LLM_CACHE_SIZE,
+    cache_dir=LLM_CACHE_DIR,
+    shared=state_backend if state_backend.shared else None,
+    shared_ttl_seconds=STATE_LLM_CACHE_TTL_SECONDS,
+)
+
+def count_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(count_tokens(message["content"]) for message in messages)
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Prompt tokens plus an allowance for the completion, as counted against the TPM limit."""
+    return count_prompt_tokens(messages) + LLM_COMPLETION_TOKEN_ESTIMATE
+
+def record_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    llm_tokens.inc(prompt_tokens, model=model, type="prompt")
+    llm_tokens.inc(completion_tokens, model=model, type="completion")
+    trace_count(f"tokens.{model}.prompt", prompt_tokens)
+    trace_count(f"tokens.{model}.completion", completion_tokens)
+
+def record_usage(model: str, usage):
+    if usage is not None:
+        record_tokens(model, getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+async def chat_completion(messages: List[Dict[str, str]], model: str, temperature: float = 0.5,
+                          use_cache: bool = True, response_format: Optional[Dict[str, str]] = None) -> str:
+    """Run a chat completion through the gateway and return the message text.
+
+    model is required so every call site picks its configured per-stage model.
+    """
+    options = {"response_format": response_format} if response_format else {}
+    key = cache_key(model, messages, temperature, **options)
+    if use_cache:
+        cached = response_cache.get(key)
+        trace_count("llm_cache.hit" if cached is not None else "llm_cache.miss")
+        if cached is not None:
+            return cached
+    response = await gateway.call(model, estimate_tokens(messages), lambda: async_client.get().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        **options,
+    ))
+    content = response.choices[0].message.content
+    record_usage(model, getattr(response, "usage", None))
+    if use_cache and content is not None:
+        response_cache.set(key, content)
+    return content
+
+async def stream_chat_completion(messages: List[Dict[str, str]], model: str, temperature: float = 0.5) -> AsyncIterator[str]:
+    """Like chat_completion, but yield text deltas as the model produces them."""
+    key = cache_key(model, messages, temperature)
+    cached = response_cache.get(key)
+    trace_count("llm_cache.hit" if cached is not None else "llm_cache.miss")
+    if cached is not None:
+        yield cached
+        return
+    # The gateway covers opening the stream; a failure mid-stream is not retried
+    stream = await gateway.call(model, estimate_tokens(messages), lambda: async_client.get().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        stream=True,
+    ))
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    # Streamed responses carry no usage, so count the tokens locally
+    record_tokens(model, count_prompt_tokens(messages), count_tokens("".join(parts)))
+    response_cache.set(key, "".join(parts))
+
+def embedding_batches(token_counts: List[int], max_texts: int = EMBEDDING_BATCH_SIZE,
+                      max_tokens: int = EMBEDDING_BATCH_TOKENS) -> List[range]:
+    """Consecutive index ranges with at most max_texts texts and, past the first text, max_tokens tokens."""
+    batches = []
+    start, batch_tokens = 0, 0
+    for index, tokens in enumerate(token_counts):
+        if index > start and (index - start >= max_texts or batch_tokens + tokens > max_tokens):
+            batches.append(range(start, index))
+            start, batch_tokens = index, 0
+        batch_tokens += tokens
+    if start < len(token_counts):
+        batches.append(range(start, len(token_counts)))
+    return batches
+
+async def embed_texts(texts: List[str], model: str = EMBEDDING_MODEL, token_counts: Optional[List[int]] = None) -> np.ndarray:
+    """Embed texts in batches and return a (len(texts), dimensions) float32 matrix.
+
+    Batches are capped by text count and by tokens per request; pass token_counts when they're
+    already known to skip counting.
+    """
+    if token_counts is None:
+        token_counts = [count_tokens(text) for text in texts]
+    batches = embedding_batches(token_counts)
+
+    async def embed_batch(batch: range) -> List[List[float]]:
+        inputs = [texts[index].replace("\n", " ") for index in batch]
+        response = await gateway.call(model, sum(token_counts[index] for index in batch), lambda: async_client.get().embeddings.create(
+            input=inputs,
+            model=model,
+        ))
+        record_usage(model, getattr(response, "usage", None))
+        return [item.embedding for item in response.data]
+
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return np.array([vector for batch in results for vector in batch], dtype=np.float32)
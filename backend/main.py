@@ -1,9 +1,12 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import yfinance as yf
 from datetime import datetime
+from watchlist import load_watchlist
+from market import FinancialMetricsCache
+from http_cache import StaticJSON
+import os
 
 app = FastAPI()
 
@@ -84,74 +87,86 @@ class Report(BaseModel):
     sources: List[str]
     generated_at: str
 
+# The same watchlist settings as config.py. They are read directly because this app doesn't
+# need the OpenAI key, and default to the companies this endpoint has always tracked
+watchlist = load_watchlist(
+    os.getenv("WATCHLIST_FILE"), os.getenv("WATCHLIST") or "AAPL=Apple,GOOGL=Alphabet,MSFT=Microsoft,NVDA=NVIDIA,META=Meta",
+)
+
+# Quotes refreshed by the shared background scheduler, so requests never fetch from yfinance
+financial_metrics_cache = FinancialMetricsCache(watchlist)
+
+@app.on_event("startup")
+async def start_financial_metrics_scheduler():
+    financial_metrics_cache.ensure_started()
+
 # Financial Metrics Endpoint
 @app.get("/api/financial-metrics", response_model=List[FinancialMetric])
 async def get_financial_metrics():
-    tech_companies = ["AAPL", "GOOGL", "MSFT", "NVDA", "META"]
-    metrics = []
-    
-    for symbol in tech_companies:
-        try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            metrics.append(
-                FinancialMetric(
-                    company=info.get('longName', ''),
-                    symbol=symbol,
-                    price=info.get('currentPrice', 0.0),
-                    change_percent=info.get('regularMarketChangePercent', 0.0),
-                    market_cap=info.get('marketCap', 0.0),
-                    pe_ratio=info.get('forwardPE', None)
-                )
-            )
-        except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
-    
-    return metrics
+    quotes = await financial_metrics_cache.get(financial_metrics_cache.companies)
+    # fast_info quotes carry no P/E ratio
+    return [
+        FinancialMetric(company=quote["name"], symbol=quote["symbol"], price=quote["price"] or 0.0,
+                        change_percent=quote["change"] or 0.0, market_cap=quote["marketCap"] or 0.0, pe_ratio=None)
+        for quote in quotes
+    ]
+
+# The feeds are fixed until they come from a real source, so each is serialized once and
+# served with an ETag; browsers and the edge revalidate instead of downloading it again
+FEED_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=3600"
+
+TECH_EVENTS = [
+    TechEvent(
+        company="OpenAI",
+        title="GPT-5 Development Announcement",
+        description="OpenAI announces development progress on GPT-5 with improved reasoning capabilities.",
+        date="2024-03-21",
+        event_type="Research"
+    ),
+    # Add more events...
+]
+tech_events_feed = StaticJSON(TECH_EVENTS, FEED_CACHE_CONTROL)
 
 # Tech Events Endpoint
 @app.get("/api/tech-events", response_model=List[TechEvent])
-async def get_tech_events():
+async def get_tech_events(request: Request):
     # This would typically fetch from a news API or database
-    return [
-        TechEvent(
-            company="OpenAI",
-            title="GPT-5 Development Announcement",
-            description="OpenAI announces development progress on GPT-5 with improved reasoning capabilities.",
-            date="2024-03-21",
-            event_type="Research"
-        ),
-        # Add more events...
-    ]
+    return tech_events_feed.respond(request)
+
+REGULATORY_UPDATES = [
+    RegulatoryUpdate(
+        title="EU AI Act Implementation",
+        description="New guidelines for AI system deployment in the European Union.",
+        region="EU",
+        date="2024-03-20",
+        impact_level="High"
+    ),
+    # Add more updates...
+]
+regulatory_updates_feed = StaticJSON(REGULATORY_UPDATES, FEED_CACHE_CONTROL)
 
 # Regulatory Updates Endpoint
 @app.get("/api/regulatory", response_model=List[RegulatoryUpdate])
-async def get_regulatory_updates():
-    return [
-        RegulatoryUpdate(
-            title="EU AI Act Implementation",
-            description="New guidelines for AI system deployment in the European Union.",
-            region="EU",
-            date="2024-03-20",
-            impact_level="High"
-        ),
-        # Add more updates...
-    ]
+async def get_regulatory_updates(request: Request):
+    return regulatory_updates_feed.respond(request)
+
+PRODUCT_NEWS = [
+    ProductNews(
+        company="Microsoft",
+        product_name="Azure AI",
+        title="New Azure AI Features Released",
+        description="Microsoft adds new computer vision capabilities to Azure AI services.",
+        date="2024-03-19",
+        category="AI"
+    ),
+    # Add more product news...
+]
+product_news_feed = StaticJSON(PRODUCT_NEWS, FEED_CACHE_CONTROL)
 
 # Product News Endpoint
 @app.get("/api/product-news", response_model=List[ProductNews])
-async def get_product_news():
-    return [
-        ProductNews(
-            company="Microsoft",
-            product_name="Azure AI",
-            title="New Azure AI Features Released",
-            description="Microsoft adds new computer vision capabilities to Azure AI services.",
-            date="2024-03-19",
-            category="AI"
-        ),
-        # Add more product news...
-    ]
+async def get_product_news(request: Request):
+    return product_news_feed.respond(request)
 
 # Research Agent Endpoint
 @app.post("/api/research", response_model=ResearchResponse)
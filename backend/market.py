@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import importlib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from timeseries import TimeSeriesStore
+from metrics import yfinance_fetch_seconds
+from startup import LazyResource
+from state import StateBackend
+
+# yfinance pulls in pandas; import it on the scheduler's first fetch, off the startup path
+yfinance = LazyResource("yfinance", lambda: importlib.import_module("yfinance"))
+
+def fetch_quote(company: Dict[str, str]) -> Dict[str, object]:
+    """Blocking yfinance lookup for one ticker; run it in a thread."""
+    info = yfinance.get().Ticker(company["symbol"]).fast_info  # Using fast_info instead of info for quicker response
+    return {
+        "symbol": company["symbol"],
+        "name": company["name"],
+        "price": info.last_price if hasattr(info, 'last_price') else 0,
+        "change": info.regular_market_price_change_percent if hasattr(info, 'regular_market_price_change_percent') else 0,
+        "marketCap": info.market_cap if hasattr(info, 'market_cap') else 0,
+        "volume": info.regular_market_volume if hasattr(info, 'regular_market_volume') else 0
+    }
+
+def timed_fetch_quote(company: Dict[str, str]) -> Dict[str, object]:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        quote = fetch_quote(company)
+        outcome = "ok"
+        return quote
+    finally:
+        yfinance_fetch_seconds.observe(time.perf_counter() - started, outcome=outcome)
+
+def empty_quote(company: Dict[str, str]) -> Dict[str, object]:
+    return {"symbol": company["symbol"], "name": company["name"], "price": 0, "change": 0, "marketCap": 0, "volume": 0}
+
+class FinancialMetricsCache:
+    """Quotes for a watchlist, kept fresh by a background scheduler and always served from memory.
+
+    Every batch_interval seconds the scheduler refreshes up to batch_size of the most overdue
+    symbols. A symbol is due once its quote is older than ttl_seconds, or hot_ttl_seconds if a
+    request asked for it within the last viewed_window_seconds. Refresh cost is therefore bounded
+    by the batch settings no matter how many requests come in. Tickers in a batch are fetched
+    concurrently on a dedicated thread pool, and fresh quotes are appended to `history` when given.
+
+    With a shared state backend only the worker process holding the scheduler lease fetches.
+    It writes quotes there, and every process copies new ones into memory (and its history)
+    each batch_interval. Requested symbols are reported back so the scheduler still sees them as hot.
+    """
+
+    def __init__(self, companies: List[Dict[str, str]], ttl_seconds: float = 300, hot_ttl_seconds: float = 60,
+                 batch_size: int = 25, batch_interval: float = 2.0, viewed_window_seconds: float = 900,
+                 max_workers: int = 8, history: Optional[TimeSeriesStore] = None, shared: Optional[StateBackend] = None):
+        self.companies = companies
+        self.by_symbol = {company["symbol"]: company for company in companies}
+        self.ttl_seconds = ttl_seconds
+        self.hot_ttl_seconds = hot_ttl_seconds
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.viewed_window_seconds = viewed_window_seconds
+        self.history = history
+        self.shared = shared
+        self.instance_id = uuid.uuid4().hex
+        # Long enough to cover a slow batch, short enough that another process takes over quickly
+        self.lease_seconds = max(30.0, batch_interval * 5)
+        self.leader = shared is None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yfinance")
+        self.quotes: Dict[str, Dict[str, object]] = {}
+        self.updated_at: Dict[str, float] = {}  # Monotonic, for age checks
+        self.fetched_at: Dict[str, datetime] = {}  # Wall clock, for Last-Modified
+        self.last_viewed: Dict[str, float] = {}
+        self.viewed_published: Dict[str, float] = {}
+        self.scheduler_task: Optional[asyncio.Task] = None
+        self.first_batch: Optional[asyncio.Event] = None
+        self.batches = 0
+        self.fetches = 0
+        self.failures = 0
+
+    def select(self, symbols: Optional[Iterable[str]] = None, group: Optional[str] = None) -> List[Dict[str, str]]:
+        """Watchlist entries matching the requested symbols and/or group, in watchlist order."""
+        companies = self.companies
+        if symbols is not None:
+            wanted = {symbol.strip().upper() for symbol in symbols if symbol.strip()}
+            companies = [company for company in companies if company["symbol"] in wanted]
+        if group is not None:
+            companies = [company for company in companies if company.get("group") == group.lower()]
+        return companies
+
+    def mark_viewed(self, symbols: Iterable[str]):
+        now = time.monotonic()
+        for symbol in symbols:
+            if symbol in self.by_symbol:
+                self.last_viewed[symbol] = now
+                # Let the scheduling process know, at most once per batch interval per symbol
+                if self.shared is not None and now - self.viewed_published.get(symbol, float("-inf")) >= self.batch_interval:
+                    self.viewed_published[symbol] = now
+                    self.shared.set("market_viewed", symbol, time.time(), self.viewed_window_seconds)
+
+    async def get(self, companies: List[Dict[str, str]]) -> List[Dict[str, object]]:
+        """Cached quotes for companies. Only a call before the first batch has finished waits for it."""
+        self.ensure_started()
+        if not self.quotes:
+            await self.first_batch.wait()
+        return [self.quotes.get(company["symbol"]) or empty_quote(company) for company in companies]
+
+    def ensure_started(self):
+        # Started lazily as well as on startup so the task binds to the running event loop
+        if self.scheduler_task is None or self.scheduler_task.done():
+            if self.first_batch is None:
+                self.first_batch = asyncio.Event()
+            # A fresh context, so the scheduler doesn't inherit the trace of the request that started it
+            self.scheduler_task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    def age_seconds(self, symbol: str) -> Optional[float]:
+        updated_at = self.updated_at.get(symbol)
+        return time.monotonic() - updated_at if updated_at is not None else None
+
+    def is_stale(self, companies: List[Dict[str, str]]) -> bool:
+        ages = [self.age_seconds(company["symbol"]) for company in companies]
+        return any(age is None or age >= self.ttl_seconds for age in ages)
+
+    def last_modified(self, companies: List[Dict[str, str]]) -> Optional[datetime]:
+        times = [self.fetched_at[company["symbol"]] for company in companies if company["symbol"] in self.fetched_at]
+        return max(times) if times else None
+
+    def due_batch(self) -> List[Dict[str, str]]:
+        """Up to batch_size symbols past their refresh interval, most overdue first."""
+        now = time.monotonic()
+        overdue = []
+        for company in self.companies:
+            symbol = company["symbol"]
+            viewed = now - self.last_viewed.get(symbol, float("-inf")) <= self.viewed_window_seconds
+            updated_at = self.updated_at.get(symbol)
+            if updated_at is None:
+                overdue.append((float("inf"), viewed, company))
+                continue
+            ratio = (now - updated_at) / (self.hot_ttl_seconds if viewed else self.ttl_seconds)
+            if ratio >= 1:
+                overdue.append((ratio, viewed, company))
+        # Viewed symbols win ties, e.g. among symbols that have never been fetched
+        overdue.sort(key=lambda item: (-item[0], not item[1]))
+        return [company for _, _, company in overdue[:self.batch_size]]
+
+    async def refresh_batch(self, companies: List[Dict[str, str]]):
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, timed_fetch_quote, company) for company in companies),
+            return_exceptions=True,
+        )
+        fetched_at = time.time()
+        updated_at = time.monotonic()
+        fresh = []
+        for company, result in zip(companies, results):
+            self.fetches += 1
+            if isinstance(result, Exception):
+                # Keep the last known quote; the symbol becomes due again after its interval
+                print(f"Error fetching data for {company['name']}: {result}")
+                self.failures += 1
+            else:
+                self.quotes[company["symbol"]] = result
+                self.fetched_at[company["symbol"]] = datetime.fromtimestamp(fetched_at, timezone.utc)
+                fresh.append(result)
+                if self.shared is not None:
+                    self.shared.set("market_quotes", company["symbol"], {"quote": result, "fetched_at": fetched_at})
+            self.updated_at[company["symbol"]] = updated_at
+        if self.history is not None:
+            self.history.append_quotes(fresh, fetched_at)
+        self.batches += 1
+
+    def sync_from_shared(self):
+        """Adopt quotes fetched by the scheduling process, and symbols other processes were asked for."""
+        now_wall, now = time.time(), time.monotonic()
+        fresh: Dict[float, List[Dict[str, object]]] = {}
+        for symbol, entry in self.shared.get_many("market_quotes").items():
+            known = self.fetched_at.get(symbol)
+            fetched_at = datetime.fromtimestamp(entry["fetched_at"], timezone.utc)
+            if symbol not in self.by_symbol or (known is not None and known >= fetched_at):
+                continue
+            self.quotes[symbol] = entry["quote"]
+            self.fetched_at[symbol] = fetched_at
+            self.updated_at[symbol] = now - (now_wall - entry["fetched_at"])
+            fresh.setdefault(entry["fetched_at"], []).append(entry["quote"])
+        if self.history is not None:
+            for fetched_at, quotes in fresh.items():
+                self.history.append_quotes(quotes, fetched_at)
+        for symbol, viewed_at in self.shared.get_many("market_viewed").items():
+            if symbol in self.by_symbol:
+                self.last_viewed[symbol] = max(self.last_viewed.get(symbol, float("-inf")), now - (now_wall - viewed_at))
+
+    async def _run(self):
+        print(f"Starting financial metrics scheduler for {len(self.companies)} symbols")
+        while True:
+            try:
+                if self.shared is not None:
+                    self.sync_from_shared()
+                    # Taking the lease writes to the shared store, so keep it off the event loop
+                    self.leader = await asyncio.to_thread(
+                        self.shared.acquire_lease, "market_scheduler", self.instance_id, self.lease_seconds)
+                batch = self.due_batch() if self.leader else []
+                if batch:
+                    await self.refresh_batch(batch)
+            except Exception as e:
+                print(f"Financial metrics refresh failed: {e}")
+            # Unblock first readers even if the first batch failed; they get placeholder quotes
+            self.first_batch.set()
+            await asyncio.sleep(self.batch_interval)
+
+    def stats(self) -> dict:
+        ages = [self.age_seconds(company["symbol"]) for company in self.companies]
+        known = [age for age in ages if age is not None]
+        return {
+            "tickers": len(self.companies),
+            "cached": len(self.quotes),
+            "stale": sum(1 for age in ages if age is None or age >= self.ttl_seconds),
+            "oldest_age_seconds": round(max(known), 3) if known else None,
+            "hot": sum(1 for viewed in self.last_viewed.values() if time.monotonic() - viewed <= self.viewed_window_seconds),
+            "running": self.scheduler_task is not None and not self.scheduler_task.done(),
+            "leader": self.leader,
+            "batches": self.batches,
+            "fetches": self.fetches,
+            "ticker_failures": self.failures,
+        }
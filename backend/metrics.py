@@ -0,0 +1,244 @@
+import asyncio
+import contextvars
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """Base for metrics keyed by label values. Thread-safe, since yfinance lookups and tokenization run in threads."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+class Gauge(Metric):
+    """A value set directly, typically from a collector right before each scrape.
+
+    metric_type can be "counter" for totals that another component already tracks.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), metric_type: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.metric_type = metric_type
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self.lock:
+            self.values[self.key(labels)] = float(value)
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = list(self.values.items())
+        return self.header() + [f"{self.name}{format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf bucket, sum, count)
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    """Metrics plus collectors that refresh gauges from component stats at scrape time."""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to the response headers, by route", ["method", "route", "status"]))
+stage_seconds = registry.register(Histogram(
+    "stage_duration_seconds", "Time spent in tokenization, chunking, pipeline stages and storage calls", ["stage"]))
+llm_request_seconds = registry.register(Histogram(
+    "llm_request_duration_seconds", "OpenAI request latency per attempt, excluding rate-limit waits", ["model"]))
+llm_requests = registry.register(Counter(
+    "llm_requests_total", "OpenAI request attempts by outcome (ok, throttled or error)", ["model", "outcome"]))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "Prompt and completion tokens by model", ["model", "type"]))
+yfinance_fetch_seconds = registry.register(Histogram(
+    "yfinance_fetch_duration_seconds", "yfinance quote lookup latency", ["outcome"]))
+summary_reduce_depth = registry.register(Histogram(
+    "summary_reduce_depth", "Levels in each hierarchical summary reduction, the final combine included",
+    buckets=(1, 2, 3, 4, 5, 6, 8)))
+summary_reduce_calls = registry.register(Counter(
+    "summary_reduce_calls_total", "LLM calls made by hierarchical summary reductions"))
+event_loop_lag_seconds = registry.register(Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping monitor task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+
+class Trace:
+    """Per-request timing and counters, collected when the client opts in with a trace header."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.spans: "OrderedDict[str, List[float]]" = OrderedDict()  # name -> [count, total seconds]
+        self.counters: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float):
+        with self.lock:
+            entry = self.spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def count(self, name: str, amount: float = 1.0):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0.0) + amount
+
+    def server_timing(self) -> str:
+        """Spans as a Server-Timing header, which browser dev tools display."""
+        with self.lock:
+            spans = list(self.spans.items())
+        return ", ".join(f'{name};dur={total * 1000:.1f};desc="{int(count)}x"' for name, (count, total) in spans)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "trace_id": self.trace_id,
+                "started_at": self.started_at,
+                "spans": {name: {"count": int(count), "seconds": round(total, 4)} for name, (count, total) in self.spans.items()},
+                "counters": dict(self.counters),
+            }
+
+# The trace of the request being handled; tasks and threads started by the request inherit it
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+def trace_span(name: str, seconds: float):
+    """Add time to the current request's trace only, for things with their own histogram."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_span(name, seconds)
+
+def trace_count(name: str, amount: float = 1.0):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.count(name, amount)
+
+def record_stage(name: str, seconds: float):
+    stage_seconds.observe(seconds, stage=name)
+    trace_span(name, seconds)
+
+def record_reduction(depth: int, calls: int):
+    summary_reduce_depth.observe(depth)
+    summary_reduce_calls.inc(calls)
+    trace_count("summary_reduce.depth", depth)
+    trace_count("summary_reduce.calls", calls)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block into stage_duration_seconds and the current trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+class TraceBuffer:
+    """The most recent traces by ID, so streamed requests can be inspected once they finish."""
+
+    def __init__(self, max_traces: int = 200):
+        self.max_traces = max_traces
+        self.traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def add(self, trace: Trace):
+        self.traces[trace.trace_id] = trace
+        while len(self.traces) > self.max_traces:
+            self.traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self.traces.get(trace_id)
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Sleep for `interval` forever and record how late each wake-up is; lag means something blocked the loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - start - interval))
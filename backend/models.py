@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class Document(BaseModel):
+    title: str
+    content: str
+    type: str
+    url: Optional[str] = None
+    date: Optional[str] = None
+    job_id: Optional[str] = None  # Client-chosen ID for following progress
+    document_id: Optional[str] = None  # Client-chosen ID for a document resubmitted as it grows or changes
+
+class DocumentBatch(BaseModel):
+    documents: List[Document]
+
+class Entity(BaseModel):
+    name: str
+    type: str
+
+class ChunkAnalysis(BaseModel):
+    """Structured-output result for one chunk: summary sections, key points and typed entities."""
+    summary: str = ""
+    key_points: List[str] = []
+    entities: List[Entity] = []
+
+class Summary(BaseModel):
+    title: str
+    summary: str
+    key_points: List[str]
+    entities: List[Entity]
+    timestamp: str
+    source_url: Optional[str] = None
+    event_date: Optional[str] = None
+    job_id: Optional[str] = None
+    context_id: Optional[str] = None  # Pass to /api/research/question instead of the content
+
+class Question(BaseModel):
+    question: str
+    context_id: str
+    document_content: Optional[str] = None  # Only needed when context_id isn't stored server-side
+    question_id: str
+    mode: Optional[str] = None  # "retrieval", "scan" or "cascade", defaults to QUESTION_MODE
+
+class Answer(BaseModel):
+    answer: str
+    status: str = "complete"
+    stats: Optional[Dict[str, Any]] = None  # Chunks processed per tier and the answer model
@@ -0,0 +1,616 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from pydantic import ValidationError
+from config import (
+    EXTRACTION_MODE, EXTRACTION_MODEL, REDUCE_TOKEN_BUDGET, REDUCE_MAX_FAN_IN, CONTENT_DEFINED_BOUNDARIES,
+    SUMMARY_MODEL, KEY_POINTS_MODEL, ENTITY_MODEL, REPORT_MODEL,
+)
+from llm import chat_completion, stream_chat_completion
+from cache import cache_key
+from incremental import AnalysisMemo
+from tokenization import count_tokens
+from metrics import record_stage, record_reduction
+from models import ChunkAnalysis, Entity
+
+CHUNK_SUMMARY_PROMPT = """Generate a structured summary of the text section with clear subtitles.
+    Use the following format:
+
+    ## Main Points
+    [Summary of main points]
+
+    ## Key Developments
+    [Important developments or announcements]
+
+    ## Impact & Implications
+    [Analysis of potential impacts]
+
+    ## Notable Details
+    [Any other significant details]
+
+    Make each section concise but informative. Use bullet points where appropriate."""
+
+COMBINE_SUMMARY_PROMPT = """Create a cohesive final summary from these section summaries.
+    Maintain the structured format with clear sections:
+
+    # Executive Overview
+    [Brief overview of the entire content]
+
+    ## Key Findings
+    [Main takeaways and findings]
+
+    ## Strategic Implications
+    [Important implications and impacts]
+
+    ## Detailed Analysis
+    [Breakdown of major points]
+
+    ## Additional Insights
+    [Other relevant information]
+
+    Ensure the summary is well-organized and eliminates redundancy."""
+
+DIRECT_SUMMARY_PROMPT = """Create a structured summary with clear sections:
+
+    # Executive Overview
+    [Brief overview of the content]
+
+    ## Key Findings
+    [Main takeaways and findings]
+
+    ## Strategic Implications
+    [Important implications and impacts]
+
+    ## Detailed Analysis
+    [Breakdown of major points]
+
+    ## Additional Insights
+    [Other relevant information]
+
+    Make each section concise but informative."""
+
+MERGE_SUMMARY_PROMPT = """Merge these section summaries into a single section summary, eliminating redundancy.
+    Use the following format:
+
+    ## Main Points
+    [Summary of main points]
+
+    ## Key Developments
+    [Important developments or announcements]
+
+    ## Impact & Implications
+    [Analysis of potential impacts]
+
+    ## Notable Details
+    [Any other significant details]
+
+    Make each section concise but informative. Use bullet points where appropriate."""
+
+REPORT_PROMPT = """Generate a comprehensive report in HTML format with the following sections:
+    1. Executive Summary
+    2. Key Findings
+    3. Analysis & Implications
+    4. Recommendations
+    5. Technical Details (if applicable)
+
+    Use appropriate HTML tags for structure (h2, p, ul, etc.)."""
+
+STRUCTURED_PROMPT = """Analyze the text and respond with a single JSON object with exactly these fields:
+    "summary": a markdown string following the format below
+    "key_points": a list of {key_point_count} key points, each a short string
+    "entities": a list of key entities (people, organizations, technologies), each an object with "name" and "type"
+
+    Summary format:
+    {summary_prompt}"""
+
+def batch_by_tokens(texts: List[str], token_budget: int, max_fan_in: int, content_defined: bool = False) -> List[List[str]]:
+    """Group consecutive texts into batches within the token budget and fan-in limit.
+
+    Batches always take at least two texts when available so every reduction level shrinks;
+    only the last batch of a level can hold a single text.
+    content_defined also ends a batch after any text whose hash hits 1 in max_fan_in / 2, so a
+    changed or inserted text regroups only its neighbours rather than every later batch.
+    """
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    batch_tokens = 0
+    divisor = max(2, max_fan_in // 2)
+    for text in texts:
+        tokens = count_tokens(text)
+        if len(batch) >= 2 and (batch_tokens + tokens > token_budget or len(batch) >= max_fan_in):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+        if content_defined and len(batch) >= 2 and int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) % divisor == 0:
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+def parse_points(text: str) -> List[str]:
+    """Split a bullet-pointed LLM response into clean points."""
+    return [point.replace('•', '').replace('-', '').strip() for point in text.split('\n') if point.strip()]
+
+def merge_entities(entity_lists: List[List[Entity]]) -> List[Entity]:
+    """Union of entities across chunks, keeping the first spelling of each name and type."""
+    seen = set()
+    merged = []
+    for entities in entity_lists:
+        for entity in entities:
+            key = (entity.name.lower(), entity.type.lower())
+            if key not in seen:
+                seen.add(key)
+                merged.append(entity)
+    return merged
+
+def salvage_chunk_analysis(response: str) -> ChunkAnalysis:
+    """Keep the fields of a structured reply that validate on their own; text that isn't JSON becomes the summary."""
+    try:
+        data = json.loads(response)
+    except ValueError:
+        return ChunkAnalysis(summary=response)
+    if not isinstance(data, dict):
+        return ChunkAnalysis(summary=response)
+    fields = {}
+    for name in ChunkAnalysis.model_fields:
+        if name in data:
+            try:
+                ChunkAnalysis.model_validate({name: data[name]})
+            except ValidationError:
+                continue
+            fields[name] = data[name]
+    return ChunkAnalysis.model_validate(fields)
+
+def parse_entities(text: str) -> List[Entity]:
+    """Parse "Entity Name (Type)" lines into entities."""
+    entities = []
+    for line in text.split('\n'):
+        if '(' in line and ')' in line:
+            name = line.split('(')[0].strip()
+            type_ = line.split('(')[1].split(')')[0].strip()
+            entities.append(Entity(name=name, type=type_))
+    return entities
+
+class ChunkFeed:
+    """Analysis chunks handed to a pipeline while the document is still arriving.
+
+    put() waits while max_pending chunks are queued, so analysis falling behind slows the
+    upload down instead of buffering it; close() marks the end of the document.
+    """
+
+    def __init__(self, max_pending: int = 16):
+        self.max_pending = max_pending
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    async def put(self, chunk: str):
+        await self.queue.put(chunk)
+
+    async def close(self):
+        await self.queue.put(None)
+
+    async def get(self) -> Optional[str]:
+        return await self.queue.get()
+
+class Stage:
+    """A pipeline step: an async function run once its dependencies have finished."""
+
+    def __init__(self, name: str, run: Callable[[], Awaitable[Any]], depends_on: Sequence[str] = (), weight: int = 1):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.weight = weight  # Share of overall progress, roughly the number of LLM calls
+        self.completed = 0
+        self.total = 1
+        self.elapsed: Optional[float] = None
+
+class AnalysisPipeline:
+    """Chunk-level document analysis declared as a small dependency graph of stages.
+
+    chunk_summaries -> summary and chunk_summaries -> report; key_points and entities are
+    independent. Requested stages and their dependencies run concurrently as soon as they can.
+
+    In "structured" extraction mode a single JSON call per chunk (chunk_analyses) returns the
+    summary sections, key points and entities, and the other stages are derived from it.
+
+    With a chunk_feed instead of chunks, each chunk is analyzed as soon as it arrives. That
+    needs structured mode, since every stage is then derived from per-chunk results.
+
+    With a memo from the document's previous revision, LLM calls whose input hasn't changed
+    reuse its responses; the memo then holds this revision's responses for the next one.
+    """
+
+    def __init__(self, content: str, chunks: List[str], on_progress: Optional[Callable[[float, str], None]] = None,
+                 extraction_mode: str = EXTRACTION_MODE, on_token: Optional[Callable[[str], None]] = None,
+                 chunk_feed: Optional[ChunkFeed] = None, memo: Optional[AnalysisMemo] = None):
+        if chunk_feed is not None and extraction_mode != "structured":
+            raise ValueError("A chunk feed requires structured extraction")
+        self.content = content
+        self.chunks = chunks
+        self.chunk_feed = chunk_feed
+        self.memo = memo
+        self.on_progress = on_progress
+        self.on_token = on_token  # Receives the final summary's tokens as they stream in
+        self.extraction_mode = extraction_mode
+        self.results: Dict[str, Any] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.active: List[str] = []
+        # Summary tree reduction: every level of summaries, plus depth and LLM call counts
+        self.reduce_levels: List[List[str]] = []
+        self.reduce_stats = {"depth": 0, "calls": 0}
+        # A fed document's length is unknown up front; weights are corrected as chunks arrive
+        multi_chunk = len(chunks) > 1 or chunk_feed is not None
+        self.stages: Dict[str, Stage] = {}
+        if extraction_mode == "structured":
+            stages = (
+                Stage("chunk_analyses", self._chunk_analyses, weight=len(chunks)),
+                Stage("chunk_summaries", self._chunk_summaries_from_analyses, depends_on=["chunk_analyses"], weight=0),
+                Stage("summary", self._summary, depends_on=["chunk_summaries"], weight=1 if multi_chunk else 0),
+                Stage("key_points", self._key_points_from_analyses, depends_on=["chunk_analyses"]),
+                Stage("entities", self._entities_from_analyses, depends_on=["chunk_analyses"], weight=0),
+                Stage("report", self._report, depends_on=["chunk_summaries"]),
+            )
+        else:
+            stages = (
+                Stage("chunk_summaries", self._chunk_summaries, weight=len(chunks) if multi_chunk else 0),
+                Stage("summary", self._summary, depends_on=["chunk_summaries"]),
+                Stage("key_points", self._key_points, weight=len(chunks) + 1 if multi_chunk else 1),
+                Stage("entities", self._entities),
+                Stage("report", self._report, depends_on=["chunk_summaries"]),
+            )
+        for stage in stages:
+            self.stages[stage.name] = stage
+
+    async def run(self, *targets: str) -> Dict[str, Any]:
+        """Run the target stages (and whatever they depend on) and return their results."""
+        self.active = self._with_dependencies(targets)
+        try:
+            await asyncio.gather(*(self._schedule(name) for name in targets))
+        except BaseException:
+            # Don't leave sibling stages spending LLM calls after one has failed
+            for task in self.tasks.values():
+                task.cancel()
+            raise
+        print("Pipeline timings: " + ", ".join(f"{name} {elapsed:.2f}s" for name, elapsed in self.timings().items()))
+        return {name: self.results[name] for name in targets}
+
+    def timings(self) -> Dict[str, float]:
+        """Seconds spent in each stage that has run, excluding time waiting on dependencies."""
+        return {name: self.stages[name].elapsed for name in self.active if self.stages[name].elapsed is not None}
+
+    def _with_dependencies(self, targets: Sequence[str]) -> List[str]:
+        names: List[str] = []
+        def visit(name: str):
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            if name not in names:
+                names.append(name)
+        for name in targets:
+            visit(name)
+        return names
+
+    def _schedule(self, name: str) -> asyncio.Task:
+        # Each stage runs at most once, however many stages depend on it
+        if name not in self.tasks:
+            self.tasks[name] = asyncio.ensure_future(self._execute(self.stages[name]))
+        return self.tasks[name]
+
+    async def _execute(self, stage: Stage):
+        await asyncio.gather(*(self._schedule(dependency) for dependency in stage.depends_on))
+        start = time.perf_counter()
+        self.results[stage.name] = await stage.run()
+        stage.elapsed = time.perf_counter() - start
+        record_stage(f"pipeline.{stage.name}", stage.elapsed)
+        self._advance(stage.name, stage.total, stage.total)
+
+    def _advance(self, name: str, completed: int, total: int):
+        stage = self.stages[name]
+        stage.completed, stage.total = completed, total
+        if self.on_progress is None:
+            return
+        active = [self.stages[active_name] for active_name in self.active]
+        total_weight = sum(active_stage.weight for active_stage in active) or 1
+        done_weight = sum(active_stage.weight * active_stage.completed / active_stage.total for active_stage in active)
+        self.on_progress(done_weight / total_weight, f"{name.replace('_', ' ').capitalize()}: {completed}/{total}")
+
+    async def _chunk_summaries(self) -> List[str]:
+        if len(self.chunks) <= 1:
+            return []
+        total_chunks = len(self.chunks)
+        completed = 0
+
+        async def summarize(chunk: str) -> str:
+            nonlocal completed
+            chunk_summary = await self._complete(
+                model=SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": CHUNK_SUMMARY_PROMPT},
+                    {"role": "user", "content": chunk}
+                ],
+                temperature=0.5,
+            )
+            completed += 1
+            self._advance("chunk_summaries", completed, total_chunks)
+            return chunk_summary
+
+        print(f"Generating summaries for {total_chunks} chunks concurrently...")
+        return list(await asyncio.gather(*(summarize(chunk) for chunk in self.chunks)))
+
+    def _structured_prompt(self, multi_chunk: bool) -> str:
+        return STRUCTURED_PROMPT.format(
+            key_point_count="2-3" if multi_chunk else "3-5",
+            summary_prompt=CHUNK_SUMMARY_PROMPT if multi_chunk else DIRECT_SUMMARY_PROMPT,
+        )
+
+    async def _chunk_analyses(self) -> List[ChunkAnalysis]:
+        """One structured-output call per chunk for summary sections, key points and entities."""
+        if self.chunk_feed is not None:
+            return await self._chunk_analyses_from_feed()
+        prompt = self._structured_prompt(len(self.chunks) > 1)
+        total_chunks = len(self.chunks)
+        completed = 0
+
+        async def analyze(chunk: str) -> ChunkAnalysis:
+            nonlocal completed
+            analysis = await self._analyze_chunk(prompt, chunk)
+            completed += 1
+            self._advance("chunk_analyses", completed, total_chunks)
+            return analysis
+
+        print(f"Analyzing {total_chunks} chunks with structured output...")
+        return list(await asyncio.gather(*(analyze(chunk) for chunk in self.chunks)))
+
+    async def _chunk_analyses_from_feed(self) -> List[ChunkAnalysis]:
+        """Analyze fed chunks as they arrive, with at most max_pending analyses holding a chunk at once."""
+        feed = self.chunk_feed
+        stage = self.stages["chunk_analyses"]
+        first, second = await feed.get(), None
+        if first is not None:
+            second = await feed.get()
+        if second is None:
+            # The whole document fit in one chunk, so it's also what a report would read
+            self.chunks = [first or ""]
+            self.content = self.content or self.chunks[0]
+            analysis = await self._analyze_chunk(self._structured_prompt(False), self.chunks[0])
+            self.stages["summary"].weight = 0
+            return [analysis]
+        prompt = self._structured_prompt(True)
+        slots = asyncio.Semaphore(feed.max_pending)
+        tasks: List[asyncio.Task] = []
+        failures: List[BaseException] = []
+        completed = 0
+
+        async def analyze(chunk: str) -> ChunkAnalysis:
+            nonlocal completed
+            try:
+                analysis = await self._analyze_chunk(prompt, chunk)
+            except Exception as e:
+                failures.append(e)
+                raise
+            finally:
+                slots.release()
+            completed += 1
+            self._advance("chunk_analyses", completed, len(tasks))
+            return analysis
+
+        try:
+            chunk = first
+            while chunk is not None:
+                await slots.acquire()
+                if failures:
+                    # Stop taking chunks, which fails the upload too, rather than analyzing the rest for nothing
+                    raise failures[0]
+                tasks.append(asyncio.ensure_future(analyze(chunk)))
+                stage.weight = len(tasks)
+                chunk = second if len(tasks) == 1 else await feed.get()
+            print(f"Analyzed {len(tasks)} streamed chunks with structured output")
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def _analyze_chunk(self, prompt: str, chunk: str) -> ChunkAnalysis:
+        response = await self._complete(
+            model=EXTRACTION_MODEL,
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": chunk}
+            ],
+            temperature=0.3,
+            response_format={"type": "json_object"},
+        )
+        try:
+            return ChunkAnalysis.model_validate_json(response)
+        except ValidationError as e:
+            print(f"Invalid structured output for chunk, keeping the valid fields: {e}")
+            return salvage_chunk_analysis(response)
+
+    async def _chunk_summaries_from_analyses(self) -> List[str]:
+        if len(self.results["chunk_analyses"]) <= 1:
+            return []
+        return [analysis.summary for analysis in self.results["chunk_analyses"]]
+
+    async def _key_points_from_analyses(self) -> List[str]:
+        all_points = [point.strip() for analysis in self.results["chunk_analyses"] for point in analysis.key_points if point.strip()]
+        try:
+            return await self._combine_key_points(all_points)
+        except Exception as e:
+            print(f"Error combining key points: {e}")
+            return all_points
+
+    async def _entities_from_analyses(self) -> List[Entity]:
+        return merge_entities([analysis.entities for analysis in self.results["chunk_analyses"]])
+
+    async def _combine_key_points(self, all_points: List[str]) -> List[str]:
+        # Combine and deduplicate key points
+        if len(all_points) > 5:
+            final_points = await self._complete(
+                model=KEY_POINTS_MODEL,
+                messages=[
+                    {"role": "system", "content": "From these key points, create a final list of 3-5 most important points, combining similar points and eliminating redundancy:"},
+                    {"role": "user", "content": "\n".join(all_points)}
+                ],
+                temperature=0.3,
+            )
+            return parse_points(final_points)
+        return all_points
+
+    async def _summary(self) -> str:
+        chunk_summaries = self.results["chunk_summaries"]
+        if not chunk_summaries and "chunk_analyses" in self.results:
+            # The single structured call already produced the summary in the final format
+            summary = self.results["chunk_analyses"][0].summary
+            if self.on_token:
+                self.on_token(summary)
+            return summary
+        if chunk_summaries:
+            return await self._reduce_summaries(chunk_summaries)
+        # For shorter content, process directly with the same structured format
+        return await self._final_completion([
+            {"role": "system", "content": DIRECT_SUMMARY_PROMPT},
+            {"role": "user", "content": self.chunks[0]}
+        ])
+
+    async def _complete(self, messages: List[Dict[str, str]], model: str, temperature: float,
+                        response_format: Optional[Dict[str, str]] = None) -> str:
+        """chat_completion, answered from the memo when this exact call ran for the previous revision."""
+        if self.memo is None:
+            return await chat_completion(messages, model=model, temperature=temperature, response_format=response_format)
+        options = {"response_format": response_format} if response_format else {}
+        return await self.memo.get_or_compute(
+            cache_key(model, messages, temperature, **options),
+            lambda: chat_completion(messages, model=model, temperature=temperature, response_format=response_format),
+        )
+
+    async def _final_completion(self, messages: List[Dict[str, str]]) -> str:
+        """The call that produces the final summary, streamed to on_token when set."""
+        if self.on_token is None:
+            return await self._complete(model=SUMMARY_MODEL, messages=messages, temperature=0.5)
+        if self.memo is None:
+            return await self._stream_final_completion(messages)
+        streamed = False
+
+        async def stream() -> str:
+            nonlocal streamed
+            streamed = True
+            return await self._stream_final_completion(messages)
+
+        summary = await self.memo.get_or_compute(cache_key(SUMMARY_MODEL, messages, 0.5), stream)
+        if not streamed:
+            # Reused from the previous revision, so hand it over in one piece
+            self.on_token(summary)
+        return summary
+
+    async def _stream_final_completion(self, messages: List[Dict[str, str]]) -> str:
+        parts = []
+        async for text in stream_chat_completion(messages, model=SUMMARY_MODEL, temperature=0.5):
+            parts.append(text)
+            self.on_token(text)
+        return "".join(parts)
+
+    async def _reduce_summaries(self, summaries: List[str]) -> str:
+        """Tree-reduce summaries in token-bounded batches, one concurrent level at a time."""
+        self.reduce_levels = [summaries]
+        level = summaries
+        while True:
+            # Content-defined batches only pay off when the memo lets a later revision reuse them
+            batches = batch_by_tokens(level, REDUCE_TOKEN_BUDGET, REDUCE_MAX_FAN_IN,
+                                      content_defined=CONTENT_DEFINED_BOUNDARIES and self.memo is not None)
+            self.reduce_stats["depth"] += 1
+            if len(batches) == 1:
+                # Combine the last level into the final summary
+                self.reduce_stats["calls"] += 1
+                print(f"Summary reduction: depth {self.reduce_stats['depth']}, {self.reduce_stats['calls']} calls")
+                record_reduction(self.reduce_stats["depth"], self.reduce_stats["calls"])
+                return await self._final_completion([
+                    {"role": "system", "content": COMBINE_SUMMARY_PROMPT},
+                    {"role": "user", "content": "\n\n".join(batches[0])}
+                ])
+            merges = [batch for batch in batches if len(batch) > 1]
+            self.reduce_stats["calls"] += len(merges)
+            print(f"Reducing {len(level)} summaries in {len(merges)} batches (level {self.reduce_stats['depth']})...")
+            # A batch of one (left over at the end of a level) moves up as is; merging it would only add drift
+            level = list(await asyncio.gather(*(
+                self._merge_summaries(batch) if len(batch) > 1 else self._pass_through(batch[0]) for batch in batches
+            )))
+            self.reduce_levels.append(level)
+
+    async def _pass_through(self, summary: str) -> str:
+        return summary
+
+    async def _merge_summaries(self, batch: List[str]) -> str:
+        return await self._complete(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": MERGE_SUMMARY_PROMPT},
+                {"role": "user", "content": "\n\n".join(batch)}
+            ],
+            temperature=0.5,
+        )
+
+    async def _key_points(self) -> List[str]:
+        try:
+            if len(self.chunks) > 1:
+                print(f"Extracting key points from {len(self.chunks)} chunks concurrently...")
+                chunk_points = await asyncio.gather(*(
+                    self._complete(
+                        model=KEY_POINTS_MODEL,
+                        messages=[
+                            {"role": "system", "content": "Extract 2-3 key points from this section of text. Return them as a bullet-pointed list."},
+                            {"role": "user", "content": chunk}
+                        ],
+                        temperature=0.3,
+                    )
+                    for chunk in self.chunks
+                ))
+                all_points = [point for points in chunk_points for point in parse_points(points)]
+                return await self._combine_key_points(all_points)
+            points = await self._complete(
+                model=KEY_POINTS_MODEL,
+                messages=[
+                    {"role": "system", "content": "Extract 3-5 key points from the text. Return them as a bullet-pointed list."},
+                    {"role": "user", "content": self.chunks[0]}
+                ],
+                temperature=0.3,
+            )
+            return parse_points(points)
+        except Exception as e:
+            print(f"Error extracting key points: {e}")
+            return []
+
+    async def _entities(self) -> List[Entity]:
+        try:
+            entities_text = await self._complete(
+                model=ENTITY_MODEL,
+                messages=[
+                    {"role": "system", "content": "Extract key entities (people, organizations, technologies) from the text. Return them in this format: Entity Name (Type)"},
+                    {"role": "user", "content": self.content}
+                ],
+                temperature=0.3,
+            )
+            return parse_entities(entities_text)
+        except Exception as e:
+            print(f"Error extracting entities: {e}")
+            return []
+
+    async def _report(self) -> str:
+        # Long documents are reported from their chunk summaries so the input fits the model context
+        chunk_summaries = self.results["chunk_summaries"]
+        report_input = "\n\n".join(chunk_summaries) if chunk_summaries else self.content
+        if chunk_summaries and count_tokens(report_input) > REDUCE_TOKEN_BUDGET:
+            # Too long even as summaries: use the most detailed reduction level that fits
+            await self._schedule("summary")
+            fitting_levels = [level for level in self.reduce_levels if count_tokens("\n\n".join(level)) <= REDUCE_TOKEN_BUDGET]
+            report_input = "\n\n".join(fitting_levels[0]) if fitting_levels else self.results["summary"]
+        return await self._complete(
+            model=REPORT_MODEL,
+            messages=[
+                {"role": "system", "content": REPORT_PROMPT},
+                {"role": "user", "content": report_input}
+            ],
+            temperature=0.5,
+        )
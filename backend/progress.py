@@ -0,0 +1,74 @@
+import uuid
+from typing import AsyncIterator, Optional
+from state import StateBackend
+
+DONE_STATES = ("complete", "error")
+
+def progress_snapshot(job_id: str, progress: int = 0, status: str = "", state: str = "pending") -> dict:
+    # state is pending, running, complete or error
+    return {"job_id": job_id, "progress": progress, "status": status, "state": state}
+
+class ProgressRegistry:
+    """Job-ID keyed progress kept in the state backend, so any worker process can report or stream it.
+
+    Every update stores the job's latest snapshot and publishes it on the job's channel.
+    Finished jobs expire after ttl_seconds, others after idle_seconds without an update.
+    A subscriber to a job that hasn't started waits only start_timeout_seconds for it.
+    """
+
+    def __init__(self, backend: StateBackend, ttl_seconds: float = 300, idle_seconds: float = 3600,
+                 start_timeout_seconds: float = 30):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.idle_seconds = idle_seconds
+        self.start_timeout_seconds = start_timeout_seconds
+
+    @property
+    def latest_job_id(self) -> Optional[str]:
+        return self.backend.get("progress_latest", "job_id")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.backend.get("progress", job_id)
+
+    def save(self, snapshot: dict):
+        ttl_seconds = self.ttl_seconds if snapshot["state"] in DONE_STATES else self.idle_seconds
+        self.backend.set("progress", snapshot["job_id"], snapshot, ttl_seconds)
+        self.backend.publish(f"progress:{snapshot['job_id']}", snapshot)
+
+    def start(self, job_id: Optional[str] = None) -> str:
+        """Register a job (or reset a reused ID) and return its ID."""
+        job_id = job_id or str(uuid.uuid4())
+        self.save(progress_snapshot(job_id, state="running"))
+        self.backend.set("progress_latest", "job_id", job_id, self.idle_seconds)
+        return job_id
+
+    def update(self, job_id: str, progress: int, status: str):
+        self.save(progress_snapshot(job_id, progress, status, "complete" if progress >= 100 else "running"))
+
+    def fail(self, job_id: str, status: str):
+        current = self.get(job_id)
+        self.save(progress_snapshot(job_id, current["progress"] if current else 0, status, "error"))
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[dict]:
+        """Yield a snapshot immediately and after every update until the job finishes."""
+        # Subscribe before reading the current snapshot so no update falls in between
+        subscription = self.backend.subscribe(f"progress:{job_id}")
+        try:
+            # Clients may subscribe just before starting the job, but not to one that never starts
+            snapshot = self.get(job_id)
+            started = snapshot is not None
+            snapshot = snapshot or progress_snapshot(job_id)
+            yield snapshot
+            while snapshot["state"] not in DONE_STATES:
+                message = await subscription.get(timeout=self.idle_seconds if started else self.start_timeout_seconds)
+                started = True
+                if message is None:
+                    # Release streams waiting on an abandoned or unknown job
+                    status = "Job expired" if snapshot["state"] != "pending" else "Unknown job"
+                    message = {**snapshot, "status": status, "state": "error"}
+                elif message == snapshot:
+                    continue
+                snapshot = message
+                yield snapshot
+        finally:
+            subscription.close()
@@ -0,0 +1,58 @@
+import re
+from collections import Counter
+from typing import Dict, List
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def tokenize_words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+def cosine_scores(query_vector: np.ndarray, chunk_vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one query vector against every row of a chunk matrix."""
+    query = query_vector / (np.linalg.norm(query_vector) or 1.0)
+    norms = np.linalg.norm(chunk_vectors, axis=1)
+    norms[norms == 0] = 1.0
+    return (chunk_vectors @ query) / norms
+
+def select_top_chunks(scores: np.ndarray, chunk_token_counts: List[int], top_k: int, token_budget: int) -> List[int]:
+    """Pick the highest scoring chunks up to top_k or the token budget, returned in document order."""
+    selected = []
+    used_tokens = 0
+    for index in np.argsort(-scores)[:top_k]:
+        index = int(index)
+        # Always keep the best chunk even if it alone exceeds the budget
+        if selected and used_tokens + chunk_token_counts[index] > token_budget:
+            break
+        selected.append(index)
+        used_tokens += chunk_token_counts[index]
+    return sorted(selected)
+
+class LexicalIndex:
+    """BM25 index over a document's chunks, built once and scored locally without any API calls."""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts: List[Counter] = [Counter(tokenize_words(chunk)) for chunk in chunks]
+        self.lengths = np.array([sum(counts.values()) for counts in self.term_counts], dtype=np.float32)
+        self.average_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        document_frequency: Counter = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(chunks)
+        self.idf: Dict[str, float] = {
+            term: float(np.log(1 + (total - frequency + 0.5) / (frequency + 0.5)))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.term_counts), dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * self.lengths / (self.average_length or 1.0))
+        for term in set(tokenize_words(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            frequencies = np.array([counts.get(term, 0) for counts in self.term_counts], dtype=np.float32)
+            scores += idf * frequencies * (self.k1 + 1) / (frequencies + length_norm)
+        return scores
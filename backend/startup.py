@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+class StartupTimings:
+    """Named durations for import, startup hooks, warm-up and first use of lazy resources."""
+
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.last_mark = self.created_at
+        self.phases: "OrderedDict[str, float]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self.lock:
+            self.phases[name] = seconds
+
+    def mark(self, name: str):
+        """Record the time since the previous mark (or since creation) under name."""
+        now = time.perf_counter()
+        self.record(name, now - self.last_mark)
+        self.last_mark = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def uptime_seconds(self) -> float:
+        return time.perf_counter() - self.created_at
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            return {name: round(seconds, 4) for name, seconds in self.phases.items()}
+
+# Created by the first module that imports this one, so it's close to process start
+startup_timings = StartupTimings()
+
+class LazyResource(Generic[T]):
+    """A module or client built on first use instead of at import, so cold starts stay fast.
+
+    The build runs once even with concurrent first callers (threads included); a failed build
+    is retried on the next get(). Its duration is recorded as "lazy.<name>".
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self.value: Optional[T] = None
+        self.lock = threading.Lock()
+
+    def get(self) -> T:
+        if self.value is None:
+            with self.lock:
+                if self.value is None:
+                    with startup_timings.phase(f"lazy.{self.name}"):
+                        self.value = self.factory()
+        return self.value
+
+    @property
+    def loaded(self) -> bool:
+        return self.value is not None
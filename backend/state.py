@@ -0,0 +1,368 @@
+import asyncio
+import atexit
+from abc import ABC, abstractmethod
+import contextvars
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config import STATE_BACKEND, STATE_SQLITE_PATH, STATE_POLL_INTERVAL_SECONDS
+
+class Subscription:
+    """Messages published on one channel after subscribe(). Close it when done."""
+
+    def __init__(self, backend: "StateBackend", channel: str):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def deliver(self, message: Any):
+        # Publishers may run on another thread (or, for SQLite, in the poller), so hop onto our loop
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """The next message, or None if none arrives within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+class StateBackend(ABC):
+    """Key/value entries with optional TTLs, leases and pub/sub channels for state shared between requests.
+
+    Values must be JSON-serializable. `shared` is True when other worker processes see the
+    same state, in which case components keep their local copies in sync through it.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def get_many(self, namespace: str) -> Dict[str, Any]:
+        """Every live entry in a namespace."""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        ...
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take or renew a named lease; False while another owner holds an unexpired one."""
+
+    @abstractmethod
+    def publish(self, channel: str, message: Any):
+        ...
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel)
+        self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.subscribers.get(subscription.channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.channel]
+
+    def stats(self) -> dict:
+        return {"backend": self.__class__.__name__, "shared": self.shared,
+                "subscriptions": sum(len(subscribers) for subscribers in self.subscribers.values())}
+
+class MemoryStateBackend(StateBackend):
+    """Process-local state. The default, and all a single uvicorn worker needs."""
+
+    def __init__(self):
+        super().__init__()
+        self.entries: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}  # namespace -> key -> (value, expires_at)
+        self.leases: Dict[str, Tuple[str, float]] = {}
+        self.sets = 0
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self.entries.get(namespace, {}).get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.entries[namespace][key]
+            return None
+        return value
+
+    def get_many(self, namespace: str) -> Dict[str, Any]:
+        now = time.time()
+        return {key: value for key, (value, expires_at) in self.entries.get(namespace, {}).items()
+                if expires_at is None or expires_at > now}
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        self.entries.setdefault(namespace, {})[key] = (value, time.time() + ttl_seconds if ttl_seconds else None)
+        self.sets += 1
+        if self.sets % 1024 == 0:
+            self.evict_expired()
+
+    def delete(self, namespace: str, key: str):
+        self.entries.get(namespace, {}).pop(key, None)
+
+    def evict_expired(self):
+        now = time.time()
+        for entries in self.entries.values():
+            for key in [key for key, (_, expires_at) in entries.items() if expires_at is not None and expires_at <= now]:
+                del entries[key]
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        holder = self.leases.get(name)
+        if holder is not None and holder[0] != owner and holder[1] > now:
+            return False
+        self.leases[name] = (owner, now + ttl_seconds)
+        return True
+
+    def publish(self, channel: str, message: Any):
+        for subscription in list(self.subscribers.get(channel, ())):
+            subscription.deliver(message)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": sum(len(entries) for entries in self.entries.values())}
+
+class SQLiteStateBackend(StateBackend):
+    """State in a SQLite file in WAL mode, shared by every worker process (and instance) that opens it.
+
+    Writes (set, delete, publish) are queued to one writer thread that commits them in batches,
+    so callers on the event loop never wait for another process's write lock; until a write is
+    committed, reads in this process see it from the pending overlay. Reads run on the caller's
+    thread, which in WAL mode doesn't wait for writers, with a short busy timeout for the rare
+    case that does. Published messages go into an events table; one poller task per process
+    reads new rows every poll_interval seconds (in a worker thread) and hands them to local
+    subscribers. Events older than event_retention_seconds and expired entries are pruned periodically.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, poll_interval: float = 0.05, event_retention_seconds: float = 300,
+                 busy_timeout: float = 0.25, max_batch: int = 256):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.event_retention_seconds = event_retention_seconds
+        self.busy_timeout = busy_timeout
+        self.max_batch = max_batch
+        # One connection per thread, since callers aren't all on the event loop thread
+        self.local = threading.local()
+        self.last_event_id = 0
+        self.poller: Optional[asyncio.Task] = None
+        self.last_prune = 0.0
+        self.published = 0
+        self.delivered = 0
+        self.batches = 0
+        self.write_errors = 0
+        # Queued writes: (sequence, sql, params, entry); pending holds queued entries so reads see them
+        self.writes: "queue.Queue[Tuple[int, str, tuple, Optional[Tuple[str, str]]]]" = queue.Queue()
+        self.pending: Dict[Tuple[str, str], Tuple[int, Any, Optional[float]]] = {}  # (namespace, key) -> (sequence, value, expires_at)
+        self.pending_lock = threading.Lock()
+        self.sequence = 0
+        self.committed = threading.Condition()
+        self.committed_sequence = 0
+        db = self.connection(timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                   "expires_at REAL, PRIMARY KEY (namespace, key))")
+        db.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                   "message TEXT NOT NULL, created_at REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self.writer = threading.Thread(target=self.write_loop, name="state-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.flush)
+
+    def connection(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            # Autocommit unless a batch opens a transaction; waits up to timeout for a writer's lock
+            db = self.local.db = sqlite3.connect(self.path, timeout=self.busy_timeout if timeout is None else timeout,
+                                                 isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self.pending_lock:
+            pending = self.pending.get((namespace, key))
+        if pending is not None:
+            _, value, expires_at = pending
+            return value if expires_at is None or expires_at > time.time() else None
+        try:
+            row = self.connection().execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time()),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            print(f"State backend read of {namespace}/{key} failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, namespace: str) -> Dict[str, Any]:
+        try:
+            rows = self.connection().execute(
+                "SELECT key, value FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"State backend read of {namespace} failed: {e}")
+            rows = []
+        entries = {key: json.loads(value) for key, value in rows}
+        now = time.time()
+        with self.pending_lock:
+            pending = [(key, value, expires_at) for (pending_namespace, key), (_, value, expires_at) in self.pending.items()
+                       if pending_namespace == namespace]
+        for key, value, expires_at in pending:
+            if value is not None and (expires_at is None or expires_at > now):
+                entries[key] = value
+            else:
+                entries.pop(key, None)
+        return entries
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = time.time() + ttl_seconds if ttl_seconds else None
+        self.enqueue("INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                     (namespace, key, json.dumps(value, default=str), expires_at), (namespace, key), value, expires_at)
+
+    def delete(self, namespace: str, key: str):
+        self.enqueue("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key), (namespace, key), None, None)
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Blocks on the write lock, so call it from a worker thread."""
+        now = time.time()
+        db = self.connection(timeout=5)
+        # A single upsert, so two processes can't both take an expired lease
+        db.execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+            (name, owner, now + ttl_seconds, now),
+        )
+        row = db.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def publish(self, channel: str, message: Any):
+        self.enqueue("INSERT INTO events (channel, message, created_at) VALUES (?, ?, ?)",
+                     (channel, json.dumps(message, default=str), time.time()))
+        self.published += 1
+
+    def enqueue(self, sql: str, params: tuple, entry: Optional[Tuple[str, str]] = None, value: Any = None,
+                expires_at: Optional[float] = None):
+        with self.pending_lock:
+            self.sequence += 1
+            if entry is not None:
+                self.pending[entry] = (self.sequence, value, expires_at)
+            self.writes.put((self.sequence, sql, params, entry))
+        self.maybe_prune()
+
+    def write_loop(self):
+        db = self.connection(timeout=5)
+        while True:
+            batch = [self.writes.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                for _, sql, params, _ in batch:
+                    db.execute(sql, params)
+                db.execute("COMMIT")
+                self.batches += 1
+            except sqlite3.Error as e:
+                print(f"State backend write of {len(batch)} statements failed: {e}")
+                self.write_errors += 1
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+            with self.pending_lock:
+                for sequence, _, _, entry in batch:
+                    # Only clear the overlay if no newer write to the entry is queued
+                    if entry is not None and self.pending.get(entry, (None,))[0] == sequence:
+                        del self.pending[entry]
+            with self.committed:
+                self.committed_sequence = batch[-1][0]
+                self.committed.notify_all()
+
+    def flush(self, timeout: float = 5):
+        """Wait until every write queued so far is committed."""
+        target = self.sequence
+        with self.committed:
+            self.committed.wait_for(lambda: self.committed_sequence >= target, timeout)
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = super().subscribe(channel)
+        if self.poller is None or self.poller.done():
+            # Only events published from now on; late subscribers read current state from entries
+            self.last_event_id = self.connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+            self.poller = asyncio.create_task(self.poll(), context=contextvars.Context())
+        return subscription
+
+    async def poll(self):
+        while self.subscribers:
+            await asyncio.sleep(self.poll_interval)
+            channels = list(self.subscribers)
+            if not channels:
+                continue
+            try:
+                # The read runs in a thread; delivery stays on the loop, which owns the subscriber sets
+                rows = await asyncio.to_thread(self.new_events, channels, self.last_event_id)
+            except sqlite3.Error as e:
+                print(f"State backend poll failed: {e}")
+                continue
+            self.deliver(rows)
+
+    def new_events(self, channels: List[str], after_id: int) -> List[Tuple[int, str, str]]:
+        return self.connection().execute(
+            f"SELECT id, channel, message FROM events WHERE id > ? AND channel IN ({','.join('?' * len(channels))}) ORDER BY id",
+            (after_id, *channels),
+        ).fetchall()
+
+    def deliver(self, rows: List[Tuple[int, str, str]]):
+        for event_id, channel, message in rows:
+            self.last_event_id = event_id
+            value = json.loads(message)
+            for subscription in list(self.subscribers.get(channel, ())):
+                subscription.deliver(value)
+                self.delivered += 1
+
+    def maybe_prune(self, interval: float = 30):
+        now = time.time()
+        if now - self.last_prune < interval:
+            return
+        self.last_prune = now
+        for sql, params in (("DELETE FROM events WHERE created_at < ?", (now - self.event_retention_seconds,)),
+                            ("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)),
+                            ("DELETE FROM leases WHERE expires_at <= ?", (now,))):
+            with self.pending_lock:
+                self.sequence += 1
+                self.writes.put((self.sequence, sql, params, None))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "path": self.path, "published": self.published, "delivered": self.delivered,
+                "queued_writes": self.writes.qsize(), "write_batches": self.batches, "write_errors": self.write_errors}
+
+def create_state_backend(kind: str, sqlite_path: str, poll_interval: float = 0.05) -> StateBackend:
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(sqlite_path, poll_interval=poll_interval)
+    raise ValueError(f"Unknown STATE_BACKEND {kind!r}, expected memory or sqlite")
+
+# The backend every stateful component uses
+state_backend = create_state_backend(STATE_BACKEND, STATE_SQLITE_PATH, STATE_POLL_INTERVAL_SECONDS)
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+class SeriesBuffer:
+    """Fixed-capacity ring buffer of (timestamp, price, volume) samples for one symbol."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.volumes = np.zeros(capacity, dtype=np.float64)
+        self.next_index = 0
+        self.size = 0
+
+    def append(self, timestamp: float, price: float, volume: float):
+        self.timestamps[self.next_index] = timestamp
+        self.prices[self.next_index] = price
+        self.volumes[self.next_index] = volume
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Samples oldest first."""
+        if self.size < self.capacity:
+            window = slice(0, self.size)
+            return self.timestamps[window], self.prices[window], self.volumes[window]
+        order = np.roll(np.arange(self.capacity), -self.next_index)
+        return self.timestamps[order], self.prices[order], self.volumes[order]
+
+    def window(self, since: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        timestamps, prices, volumes = self.ordered()
+        if since is None:
+            return timestamps, prices, volumes
+        start = int(np.searchsorted(timestamps, since, side="left"))
+        return timestamps[start:], prices[start:], volumes[start:]
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.prices.nbytes + self.volumes.nbytes
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over each full window, aligned to the window's last sample (len(values) - window + 1 results)."""
+    if len(values) < window:
+        return np.zeros(0, dtype=np.float64)
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return cumulative[window:] - cumulative[:-window]
+
+def interval_volumes(volumes: np.ndarray) -> np.ndarray:
+    """Traded volume between samples from yfinance's cumulative session volume.
+
+    The counter resets at the start of each session, so a drop means the new value is the volume so far.
+    """
+    if len(volumes) == 0:
+        return volumes
+    deltas = np.diff(volumes, prepend=volumes[0])
+    return np.where(deltas < 0, volumes, deltas)
+
+def rolling_stats(timestamps: np.ndarray, prices: np.ndarray, volumes: np.ndarray, window: int) -> dict:
+    """Log returns plus rolling moving average, volatility and VWAP over `window` samples."""
+    window = max(1, window)
+    returns = np.diff(np.log(prices)) if len(prices) > 1 else np.zeros(0, dtype=np.float64)
+    traded = interval_volumes(volumes)
+
+    moving_average = rolling_sum(prices, window) / window
+    traded_sum = rolling_sum(traded, window)
+    turnover_sum = rolling_sum(prices * traded, window)
+    # Fall back to the plain average where no volume traded in the window
+    vwap = np.divide(turnover_sum, traded_sum, out=moving_average.copy(), where=traded_sum > 0)
+
+    volatility = np.zeros(0, dtype=np.float64)
+    if len(returns) >= window:
+        mean = rolling_sum(returns, window) / window
+        variance = rolling_sum(returns ** 2, window) / window - mean ** 2
+        volatility = np.sqrt(np.maximum(variance, 0.0))
+
+    return {
+        "window": window,
+        "total_return": float(prices[-1] / prices[0] - 1) if len(prices) > 1 else 0.0,
+        "returns": returns.tolist(),
+        # Rolling series are aligned to the last sample of each window
+        "moving_average": {"timestamps": timestamps[window - 1:].tolist(), "values": moving_average.tolist()},
+        "vwap": {"timestamps": timestamps[window - 1:].tolist(), "values": vwap.tolist()},
+        "volatility": {"timestamps": timestamps[window:].tolist(), "values": volatility.tolist()},
+    }
+
+class TimeSeriesStore:
+    """One SeriesBuffer per symbol, so memory per symbol stays fixed however long the server runs."""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.series: Dict[str, SeriesBuffer] = {}
+
+    def append_quotes(self, quotes: List[Dict[str, object]], timestamp: float):
+        for quote in quotes:
+            price = quote.get("price") or 0
+            # Zero prices are placeholders for failed lookups, not real samples
+            if price <= 0:
+                continue
+            symbol = quote["symbol"]
+            if symbol not in self.series:
+                self.series[symbol] = SeriesBuffer(self.capacity)
+            self.series[symbol].append(timestamp, float(price), float(quote.get("volume") or 0))
+
+    def get(self, symbol: str) -> Optional[SeriesBuffer]:
+        return self.series.get(symbol)
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self.series),
+            "capacity": self.capacity,
+            "bytes": sum(series.nbytes for series in self.series.values()),
+        }
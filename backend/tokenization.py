@@ -0,0 +1,227 @@
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import numpy as np
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+
+# Tokens hashed to decide a content-defined cut
+BOUNDARY_WINDOW = 16
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = ENCODING_NAME) -> tiktoken.Encoding:
+    """Load a tiktoken encoding once per process."""
+    return tiktoken.get_encoding(encoding_name)
+
+def warm_up(snap_to_sentences: bool, encoding_name: str = ENCODING_NAME):
+    """Load the encoding (and the sentence-end table when chunks snap to sentences) ahead of the first request."""
+    get_encoding(encoding_name)
+    if snap_to_sentences:
+        sentence_end_mask(encoding_name)
+
+@lru_cache(maxsize=None)
+def sentence_end_mask(encoding_name: str = ENCODING_NAME) -> np.ndarray:
+    """Boolean lookup table over the vocabulary: True for tokens that end a sentence or line."""
+    encoding = get_encoding(encoding_name)
+    mask = np.zeros(encoding.n_vocab, dtype=bool)
+    for token in range(encoding.n_vocab):
+        try:
+            token_bytes = encoding.decode_single_token_bytes(token)
+        except KeyError:
+            continue
+        mask[token] = b"\n" in token_bytes or token_bytes.rstrip().endswith((b".", b"!", b"?"))
+    return mask
+
+@lru_cache(maxsize=None)
+def boundary_hash_table(encoding_name: str = ENCODING_NAME) -> np.ndarray:
+    """Fixed pseudo-random 64-bit value per token, summed over a window to find content-defined cuts."""
+    return np.random.default_rng(0x5EED).integers(0, 2**63, size=get_encoding(encoding_name).n_vocab, dtype=np.uint64)
+
+def encode(text: str, encoding_name: str = ENCODING_NAME) -> np.ndarray:
+    """Encode text once into an int32 token array that every later stage can slice."""
+    return np.array(get_encoding(encoding_name).encode(text, disallowed_special=()), dtype=np.int32)
+
+def count_tokens(text: str, encoding_name: str = ENCODING_NAME) -> int:
+    return len(get_encoding(encoding_name).encode(text, disallowed_special=()))
+
+def chunk_bounds(tokens: np.ndarray, max_tokens: int, overlap: int = 0, snap_to_sentences: bool = False,
+                 content_defined: bool = False, encoding_name: str = ENCODING_NAME) -> List[Tuple[int, int]]:
+    """Split a token array into (start, end) spans of at most max_tokens.
+
+    With snap_to_sentences, each span ends on the last sentence boundary in its second half when
+    there is one. Consecutive spans share `overlap` tokens. content_defined cuts where the
+    text itself says to (see content_defined_end), so text inserted or appended elsewhere
+    leaves the other spans unchanged.
+    """
+    total = len(tokens)
+    if total == 0:
+        return [(0, 0)]
+    overlap = min(overlap, max_tokens // 2)
+    mask = sentence_end_mask(encoding_name) if snap_to_sentences else None
+    bounds = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, total)
+        if end < total:
+            end = next_chunk_end(tokens, start, max_tokens, mask, content_defined, encoding_name)
+        bounds.append((start, end))
+        if end >= total:
+            return bounds
+        start = end - overlap
+
+def next_chunk_end(tokens: np.ndarray, start: int, max_tokens: int, mask: Optional[np.ndarray],
+                   content_defined: bool = False, encoding_name: str = ENCODING_NAME) -> int:
+    """Where a chunk starting at start ends, given more than max_tokens tokens follow it."""
+    end = content_defined_end(tokens, start, max_tokens, mask, encoding_name) if content_defined else None
+    return end if end is not None else snap_chunk_end(tokens, start, start + max_tokens, max_tokens, mask)
+
+def content_defined_end(tokens: np.ndarray, start: int, max_tokens: int, mask: Optional[np.ndarray],
+                        encoding_name: str = ENCODING_NAME) -> Optional[int]:
+    """End at the first content-defined cut in the chunk's last quarter, or None if there isn't one.
+
+    A token is a cut when the hash of the BOUNDARY_WINDOW tokens ending at it hits 1 in
+    max_tokens / 8, so cuts depend only on nearby text and a chunk after an edit falls
+    back onto the same boundaries as before. With a sentence mask the cut moves forward to
+    the next sentence end.
+    """
+    floor, end = start + max_tokens * 3 // 4, start + max_tokens
+    if floor >= end:
+        return None
+    low = max(floor - BOUNDARY_WINDOW + 1, 0)
+    # Window sums from a running sum; uint64 arithmetic wraps, which is fine for hashing
+    sums = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(boundary_hash_table(encoding_name)[tokens[low:end]], dtype=np.uint64)])
+    positions = np.arange(floor, end)
+    window = sums[positions - low + 1] - sums[np.maximum(positions - BOUNDARY_WINDOW + 1, 0) - low]
+    mixed = (window * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+    hits = np.flatnonzero(mixed % np.uint64(max(1, max_tokens // 8)) == 0)
+    if not len(hits):
+        return None
+    cut = floor + int(hits[0])
+    if mask is None:
+        return cut + 1
+    sentence_ends = np.flatnonzero(mask[tokens[cut:end]])
+    return cut + int(sentence_ends[0]) + 1 if len(sentence_ends) else None
+
+def snap_chunk_end(tokens: np.ndarray, start: int, end: int, max_tokens: int, mask: Optional[np.ndarray]) -> int:
+    """Move a chunk's end back to the last sentence boundary in its second half, if there is one."""
+    if mask is None:
+        return end
+    floor = start + max_tokens // 2
+    candidates = np.flatnonzero(mask[tokens[floor:end]])
+    return floor + int(candidates[-1]) + 1 if len(candidates) else end
+
+def decode_chunks(tokens: np.ndarray, bounds: List[Tuple[int, int]], encoding_name: str = ENCODING_NAME) -> List[str]:
+    encoding = get_encoding(encoding_name)
+    return [encoding.decode(tokens[start:end].tolist()) for start, end in bounds]
+
+class ChunkTexts(Sequence):
+    """Chunk texts decoded from the token array when they're read instead of kept as strings."""
+
+    def __init__(self, tokens: np.ndarray, bounds: List[Tuple[int, int]], encoding_name: str = ENCODING_NAME):
+        self.tokens = tokens
+        self.bounds = bounds
+        self.encoding_name = encoding_name
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return decode_chunks(self.tokens, self.bounds[index], self.encoding_name)
+        start, end = self.bounds[index]
+        return get_encoding(self.encoding_name).decode(self.tokens[start:end].tolist())
+
+class TokenBuffer:
+    """An int32 token array grown in place as blocks arrive, so no second copy is made to join them."""
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.array = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+
+    def append(self, tokens: np.ndarray):
+        needed = self.count + len(tokens)
+        if needed > len(self.array):
+            self.array.resize(max(needed, 2 * len(self.array)), refcheck=False)
+        self.array[self.count:needed] = tokens
+        self.count = needed
+
+    def finish(self) -> np.ndarray:
+        """Trim the spare capacity and return the tokens; the buffer is empty afterwards."""
+        array, self.array = self.array, np.zeros(0, dtype=np.int32)
+        array.resize(self.count, refcheck=False)
+        self.count = 0
+        return array
+
+class StreamingEncoder:
+    """Encodes text that arrives in pieces, holding back the tail after the last safe cut.
+
+    Text is cut after a line break followed by a non-space character (or, in a long
+    unbroken run, before a space), where tiktoken's pre-tokenizer splits anyway, so the
+    tokens match encoding the whole text in practically all cases.
+    """
+
+    def __init__(self, encoding_name: str = ENCODING_NAME, max_held_chars: int = 1 << 16):
+        self.encoding = get_encoding(encoding_name)
+        self.max_held_chars = max_held_chars
+        self.held = ""
+
+    def feed(self, text: str) -> np.ndarray:
+        text = self.held + text
+        cut = self._safe_cut(text)
+        self.held = text[cut:]
+        return self._encode(text[:cut])
+
+    def finish(self) -> np.ndarray:
+        text, self.held = self.held, ""
+        return self._encode(text)
+
+    def _safe_cut(self, text: str) -> int:
+        position = len(text)
+        while (position := text.rfind("\n", 0, position)) >= 0:
+            if position + 1 < len(text) and not text[position + 1].isspace():
+                return position + 1
+        if len(text) <= self.max_held_chars:
+            return 0
+        position = len(text)
+        while (position := text.rfind(" ", 0, position)) > 0:
+            if not text[position - 1].isspace() and position + 1 < len(text) and not text[position + 1].isspace():
+                return position
+        return len(text)
+
+    def _encode(self, text: str) -> np.ndarray:
+        return np.array(self.encoding.encode(text, disallowed_special=()), dtype=np.int32)
+
+class StreamingChunker:
+    """Cuts a token stream into the same spans chunk_bounds() gives the whole array.
+
+    feed() returns chunks as soon as later tokens prove they aren't the last one, and only
+    the tokens of the chunk being filled are held.
+    """
+
+    def __init__(self, max_tokens: int, overlap: int = 0, snap_to_sentences: bool = False, content_defined: bool = False,
+                 encoding_name: str = ENCODING_NAME):
+        self.max_tokens = max_tokens
+        self.overlap = min(overlap, max_tokens // 2)
+        self.mask = sentence_end_mask(encoding_name) if snap_to_sentences else None
+        self.content_defined = content_defined
+        self.encoding_name = encoding_name
+        self.pending = np.zeros(0, dtype=np.int32)
+        self.emitted = 0
+
+    def feed(self, tokens: np.ndarray) -> List[np.ndarray]:
+        self.pending = np.concatenate([self.pending, tokens]) if len(self.pending) else tokens
+        chunks = []
+        while len(self.pending) > self.max_tokens:
+            end = next_chunk_end(self.pending, 0, self.max_tokens, self.mask, self.content_defined, self.encoding_name)
+            chunks.append(self.pending[:end])
+            self.pending = self.pending[end - self.overlap:]
+        self.emitted += len(chunks)
+        return chunks
+
+    def finish(self) -> List[np.ndarray]:
+        """The final chunk; an empty stream gives one empty chunk, like chunk_bounds()."""
+        if self.emitted and not len(self.pending):
+            return []
+        self.emitted += 1
+        return [self.pending]
@@ -0,0 +1,54 @@
+import json
+from typing import Dict, List, Optional
+
+# AI companies tracked when no watchlist is configured
+DEFAULT_WATCHLIST = [
+    {"symbol": "NVDA", "name": "NVIDIA", "group": "ai"},
+    {"symbol": "GOOGL", "name": "Alphabet", "group": "ai"},
+    {"symbol": "MSFT", "name": "Microsoft", "group": "ai"},
+    {"symbol": "META", "name": "Meta", "group": "ai"},
+    {"symbol": "AMD", "name": "AMD", "group": "ai"}
+]
+
+def make_entry(symbol: str, name: Optional[str] = None, group: Optional[str] = None) -> Dict[str, str]:
+    symbol = symbol.strip().upper()
+    return {"symbol": symbol, "name": (name or "").strip() or symbol, "group": (group or "").strip().lower()}
+
+def parse_watchlist_file(path: str) -> List[Dict[str, str]]:
+    """Read a JSON list (symbols or {"symbol", "name", "group"} objects) or lines of `SYMBOL[,Name[,group]]`."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        return [
+            make_entry(item) if isinstance(item, str) else make_entry(item["symbol"], item.get("name"), item.get("group"))
+            for item in json.loads(text)
+        ]
+    entries = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            entries.append(make_entry(*line.split(",")[:3]))
+    return entries
+
+def parse_watchlist_env(value: str) -> List[Dict[str, str]]:
+    """Parse `NVDA=NVIDIA,AMD,...`; names are optional."""
+    entries = []
+    for item in value.split(","):
+        if item.strip():
+            symbol, _, name = item.partition("=")
+            entries.append(make_entry(symbol, name))
+    return entries
+
+def load_watchlist(path: Optional[str] = None, symbols: Optional[str] = None) -> List[Dict[str, str]]:
+    """Watchlist from a file, else from a symbol list, else the default AI companies. Duplicates are dropped."""
+    if path:
+        entries = parse_watchlist_file(path)
+    elif symbols:
+        entries = parse_watchlist_env(symbols)
+    else:
+        entries = [dict(entry) for entry in DEFAULT_WATCHLIST]
+    unique: Dict[str, Dict[str, str]] = {}
+    for entry in entries:
+        unique.setdefault(entry["symbol"], entry)
+    print(f"Loaded watchlist with {len(unique)} symbols")
+    return list(unique.values())
@@ -6,13 +6,13 @@ import { useResearchStore } from '@/store/researchStore';
 const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8001';
 
 export function QuestionAnswer() {
-  const { document } = useResearchStore();
+  const { document, summary } = useResearchStore();
   const [question, setQuestion] = useState('');
   const [answer, setAnswer] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
-  const pollForAnswer = useCallback(async (questionId: string) => {
+  const pollForAnswer = useCallback(async (questionId: string, includeContent = !summary?.context_id) => {
     try {
       const response = await fetch(`${BACKEND_URL}/api/research/question`, {
         method: 'POST',
@@ -20,11 +20,16 @@ export function QuestionAnswer() {
         body: JSON.stringify({
           question_id: questionId,
           question: question,
-          document_content: document?.content || '',
-          context_id: 'current'
+          // The backend keeps uploaded documents by context_id, so only send the content as a fallback
+          ...(includeContent ? { document_content: document?.content || '' } : {}),
+          context_id: summary?.context_id || 'current'
         }),
       });
 
+      if (response.status === 404 && !includeContent) {
+        // Document was evicted server-side; resend it with the content
+        return pollForAnswer(questionId, true);
+      }
       if (!response.ok) throw new Error('Failed to get answer');
       
       const data = await response.json();
@@ -35,13 +40,13 @@ export function QuestionAnswer() {
         throw new Error(data.answer);
       } else {
         // Still processing, poll again in 1 second
-        setTimeout(() => pollForAnswer(questionId), 1000);
+        setTimeout(() => pollForAnswer(questionId, includeContent), 1000);
       }
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to get answer');
       setIsLoading(false);
     }
-  }, [question, document?.content]);
+  }, [question, document?.content, summary?.context_id]);
 
   useEffect(() => {
     if (isLoading) {
@@ -14,6 +14,7 @@ interface Summary {
   key_points: string[];
   entities: Array<{ name: string; type: string }>;
   timestamp: string;
+  context_id?: string;
 }
 
 interface ResearchState {